@@ -1,9 +1,21 @@
+from __future__ import annotations
+
+import os
+import time
+
 from argparse import ArgumentParser, Namespace
-from datasets import load_dataset, Dataset
-from transformers import AutoTokenizer
-import matplotlib.pyplot as plt
+from functools import partial
+from typing import TYPE_CHECKING
+
+# datasets, transformers, matplotlib and numpy take seconds to import, so they are imported by the
+# functions that use them and --help or a bad argument returns at once
+if TYPE_CHECKING:
+    from datasets import Dataset
+    from transformers import AutoTokenizer
+    import numpy as np
 
 def draw_distribution(data, title, xlabel, ylabel, bins=50):
+    import matplotlib.pyplot as plt
     plt.hist(data, bins=bins)
     plt.title(title)
     plt.xlabel(xlabel)
@@ -11,36 +23,74 @@ def draw_distribution(data, title, xlabel, ylabel, bins=50):
     plt.savefig(f'{title}.png')
     plt.clf()
 
-def show_statistics(data, title):
+def show_statistics(data: np.ndarray, title: str, percentiles: list[float]):
+    '''Percentiles are taken by rank, the value at index int(len(data) * percentile / 100) of the sorted data.'''
+    import numpy as np
+    data = np.sort(data)
     print(f'{title} Statistics:')
-    print(f'Mean: {sum(data) / len(data)}')
-    print(f'Min: {min(data)}')
-    print(f'Max: {max(data)}')
-    print(f'99.5% Percentile: {sorted(data)[int(len(data) * 0.995)]}')
-    print(f'Median: {sorted(data)[len(data) // 2]}')
+    print(f'Mean: {data.mean()}')
+    print(f'Min: {data[0]}')
+    print(f'Max: {data[-1]}')
+    for percentile in percentiles:
+        print(f'{percentile}% Percentile: {data[min(int(len(data) * percentile / 100), len(data) - 1)]}')
+    print(f'Median: {data[len(data) // 2]}')
 
-def analyze_dataset(dataset: Dataset, tokenizer: AutoTokenizer):
+def count_tokens(batch: dict, tokenizer: AutoTokenizer) -> dict:
+    return {'num_tokens': [len(input_ids) for input_ids in tokenizer(batch['text'])['input_ids']]}
+
+def tokenize_lengths(dataset: Dataset, tokenizer: AutoTokenizer, batch_size: int, num_proc: int | None) -> np.ndarray:
+    '''Token count of every text, tokenized batch_size texts per call and spread over num_proc processes.'''
+    if num_proc and num_proc > 1:
+        # the workers already run in parallel, the rust tokenizer threads would only fight over the cores
+        os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    start = time.perf_counter()
+    counted = dataset.select_columns(['text']).map(
+        partial(count_tokens, tokenizer=tokenizer), batched=True, batch_size=batch_size, num_proc=num_proc,
+        remove_columns=['text'], load_from_cache_file=False, desc='Tokenizing')
+    lengths = counted.with_format('numpy')['num_tokens']
+    elapsed = time.perf_counter() - start
+    print(f'Tokenized {len(lengths)} texts in {elapsed:.2f}s ({len(lengths) / elapsed:.1f} texts/sec)')
+    return lengths
+
+def analyze_dataset(dataset: Dataset, tokenizer: AutoTokenizer | None, batch_size: int = 1000, num_proc: int | None = None,
+                    percentiles: list[float] = [99.5]):
     '''
     The dataset must have column names 'text'.
     This function is used to analyze the dataset text length distribution and tokenized length distribution.
+    The num_tokens column written by preprocess.py --tokenizer_path is used as is when the dataset has it.
     '''
-    text_lengths = [len(text) for text in dataset['text']]
-    tokenized_lengths = [len(tokenizer(text)['input_ids']) for text in dataset['text']]
+    import pyarrow.compute as pc
+    text_lengths = pc.utf8_length(dataset.with_format('arrow')['text']).to_numpy()
+    if 'num_tokens' in dataset.column_names:
+        tokenized_lengths = dataset.with_format('numpy')['num_tokens']
+    else:
+        tokenized_lengths = tokenize_lengths(dataset, tokenizer, batch_size, num_proc)
 
     draw_distribution(text_lengths, 'Text Length Distribution', 'Text Length', 'Frequency')
-    show_statistics(text_lengths, 'Text Length')
+    show_statistics(text_lengths, 'Text Length', percentiles)
     draw_distribution(tokenized_lengths, 'Tokenized Length Distribution', 'Tokenized Length', 'Frequency')
-    show_statistics(tokenized_lengths, 'Tokenized Length')
+    show_statistics(tokenized_lengths, 'Tokenized Length', percentiles)
 
 def main(args: Namespace):
+    from datasets import load_dataset
     dataset: Dataset = load_dataset(args.hf_folder, split=args.split)
-    tokenizer: AutoTokenizer = AutoTokenizer.from_pretrained(args.tokenizer_name_or_path)
-    analyze_dataset(dataset, tokenizer)
-    
+    tokenizer: AutoTokenizer | None = None
+    if 'num_tokens' not in dataset.column_names:
+        if args.tokenizer_name_or_path is None:
+            raise SystemExit(f'the {args.split} split of {args.hf_folder} has no num_tokens column, give --tokenizer_name_or_path to tokenize it')
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer_name_or_path, local_files_only=args.local_files_only)
+    analyze_dataset(dataset, tokenizer, args.batch_size, args.num_proc, args.percentiles)
+
 if __name__ == "__main__":
     arg_parser = ArgumentParser()
     arg_parser.add_argument('--hf_folder', type=str, required=True)
-    arg_parser.add_argument('--tokenizer_name_or_path', type=str, required=True)
+    arg_parser.add_argument('--tokenizer_name_or_path', type=str, default=None,
+                            help='tokenizer for datasets without the num_tokens column of preprocess.py --tokenizer_path')
     arg_parser.add_argument('--split', type=str, required=True)
+    arg_parser.add_argument('--batch_size', type=int, default=1000, help='texts passed to the tokenizer per call')
+    arg_parser.add_argument('--num_proc', type=int, default=None, help='processes used for tokenization')
+    arg_parser.add_argument('--percentiles', type=float, nargs='+', default=[99.5], help='percentiles to report, e.g. 90 99 99.5')
+    arg_parser.add_argument('--local_files_only', action='store_true', help='only use a tokenizer already on disk or in the local cache, never the network')
     args = arg_parser.parse_args()
-    main(args)
\ No newline at end of file
+    main(args)
@@ -1,6 +1,16 @@
 OUTPUT_DIR="hf_datasets"
 SPLIT_NAME="train"
 TOKENIZER_NAME="microsoft/deberta-v3-base"
+BATCH_SIZE=1000
+NUM_PROC=4
+PERCENTILES="90 99 99.5"
+LOCAL_FILES_ONLY=0 # set to 1 to only use a tokenizer already on disk or in the local cache
+
+EXTRA_ARGS=""
+if [ "$LOCAL_FILES_ONLY" = "1" ]; then
+    EXTRA_ARGS="--local_files_only"
+fi
 
 python analyze.py \
-    --hf_folder $OUTPUT_DIR --split $SPLIT_NAME --tokenizer_name_or_path $TOKENIZER_NAME
\ No newline at end of file
+    --hf_folder $OUTPUT_DIR --split $SPLIT_NAME --tokenizer_name_or_path $TOKENIZER_NAME \
+    --batch_size $BATCH_SIZE --num_proc $NUM_PROC --percentiles $PERCENTILES $EXTRA_ARGS
@@ -0,0 +1,189 @@
+import json
+import platform
+import time
+import tracemalloc
+
+from argparse import ArgumentParser, Namespace
+from functools import partial
+
+from src.clean import (clean_text, clean_contractions, clean_special_chars, correct_spelling, remove_space, text_preprocessing_pipeline,
+                       remove_emoji, contraction_table, punct_table, punct_mapping_table, mispell_table, EMOJI_MODES)
+from src.data import Data
+from src.process_method import get_processed_method, get_choise_flag
+from src.synthetic import generate_reviews
+
+# the stages of text_preprocessing_pipeline, in the order it runs them
+STAGES = [
+    ('clean_text', clean_text),
+    ('clean_contractions', partial(clean_contractions, mapping=contraction_table)),
+    ('clean_special_chars', partial(clean_special_chars, punct=punct_table, mapping=punct_mapping_table)),
+    ('correct_spelling', partial(correct_spelling, dic=mispell_table)),
+    ('remove_space', remove_space),
+]
+PERCENTILES = [50, 90, 99]
+
+def to_data(reviews: list[dict]) -> list[Data]:
+    return [Data(
+        index=f'index_{index}',
+        rating=int(d['rating']),
+        title=d['title'],
+        text=d['text'],
+        helpful_vote=d['helpful_vote'],
+        verified_purchase=d['verified_purchase'],
+        processed_text=None
+    ) for index, d in enumerate(reviews)]
+
+def traced_peak_mb(func, *args) -> float:
+    '''Peak of the memory allocated during one call of func, tracemalloc slows the call down so it is not timed'''
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+def call_each(func, items: list):
+    for item in items:
+        func(item)
+
+def stage_inputs(texts: list[str]) -> dict[str, list[str]]:
+    '''The texts every stage is given when the pipeline runs over texts'''
+    inputs = {}
+    for name, stage in STAGES:
+        inputs[name] = texts
+        texts = [stage(text) for text in texts]
+    return inputs
+
+def latency_percentiles(latencies_ns: list[int]) -> dict:
+    latencies_ns = sorted(latencies_ns)
+    return {f'p{p}_us': latencies_ns[min(len(latencies_ns) * p // 100, len(latencies_ns) - 1)] / 1000 for p in PERCENTILES}
+
+def time_stages(texts: list[str]) -> tuple[dict, dict]:
+    '''Run the pipeline stage by stage over texts, returns the total and per call nanoseconds of every stage'''
+    totals = {name: 0 for name, _ in STAGES}
+    latencies = {name: [] for name, _ in STAGES}
+    for text in texts:
+        for name, stage in STAGES:
+            start = time.perf_counter_ns()
+            text = stage(text)
+            elapsed = time.perf_counter_ns() - start
+            totals[name] += elapsed
+            latencies[name].append(elapsed)
+    return totals, latencies
+
+def time_calls(func, texts: list[str]) -> tuple[int, list[int]]:
+    latencies = []
+    for text in texts:
+        start = time.perf_counter_ns()
+        func(text)
+        latencies.append(time.perf_counter_ns() - start)
+    return sum(latencies), latencies
+
+def run_method(flag: str, data: list[Data]):
+    for _ in get_processed_method(flag).process_train_dataset(data):
+        pass
+
+def time_method(flag: str, reviews: list[dict]) -> int:
+    data = to_data(reviews)
+    start = time.perf_counter_ns()
+    run_method(flag, data)
+    return time.perf_counter_ns() - start
+
+def result(benchmark: str, num_records: int, elapsed_ns: int, peak_mb: float, latencies_ns: list[int] | None = None) -> dict:
+    entry = {'benchmark': benchmark, 'num_records': num_records, 'records_per_sec': num_records / (elapsed_ns / 1e9)}
+    if latencies_ns:
+        entry.update(latency_percentiles(latencies_ns))
+    entry['peak_mb'] = peak_mb
+    return entry
+
+def run_benchmarks(args: Namespace) -> list[dict]:
+    '''
+    Every benchmark runs args.repeat times and keeps its fastest run, then once more to trace the peak of the memory it allocates.
+    Stage benchmarks clean the title and the text of each record, so their latencies are per text.
+    '''
+    # warm up the lazily compiled tables so the first benchmark does not pay for them
+    text_preprocessing_pipeline(next(generate_reviews(1, args.seed))['text'])
+
+    results = []
+    def add(entry: dict):
+        show_result(entry)
+        results.append(entry)
+
+    for num_records in sorted(args.num_records):
+        reviews = list(generate_reviews(num_records, args.seed, args.mean_words, args.emoji_rate, args.html_rate, args.url_rate, args.contraction_rate))
+        texts = [text for d in reviews for text in (d['title'], d['text'])]
+
+        runs = [time_stages(texts) for _ in range(args.repeat)]
+        inputs = stage_inputs(texts)
+        for name, stage in STAGES:
+            totals, latencies = min(runs, key=lambda run: run[0][name])
+            add(result(f'stage/{name}', num_records, totals[name], traced_peak_mb(call_each, stage, inputs[name]), latencies[name]))
+        del inputs
+        elapsed, latencies = min((time_calls(text_preprocessing_pipeline, texts) for _ in range(args.repeat)), key=lambda run: run[0])
+        add(result('stage/text_preprocessing_pipeline', num_records, elapsed, traced_peak_mb(call_each, text_preprocessing_pipeline, texts), latencies))
+
+        # the stages use the default strip mode, the former demojize round trip is timed next to it
+        for mode in EMOJI_MODES:
+            func = partial(remove_emoji, mode=mode)
+            elapsed, latencies = min((time_calls(func, texts) for _ in range(args.repeat)), key=lambda run: run[0])
+            add(result(f'emoji/{mode}', num_records, elapsed, traced_peak_mb(call_each, func, texts), latencies))
+
+        for flag in args.methods:
+            elapsed = min(time_method(flag, reviews) for _ in range(args.repeat))
+            add(result(f'method/{flag}', num_records, elapsed, traced_peak_mb(run_method, flag, to_data(reviews))))
+    return results
+
+def show_result(entry: dict):
+    percentiles = '  '.join(f'{name}={entry[name]:.1f}' for name in (f'p{p}_us' for p in PERCENTILES) if name in entry)
+    print(f'{entry["benchmark"]:<45}{entry["num_records"]:>9}{entry["records_per_sec"]:>14.1f}/s  {entry["peak_mb"]:>9.2f}MB  {percentiles}')
+
+def compare_with_baseline(results: list[dict], baseline_path: str, tolerance: float) -> list[str]:
+    '''Messages for every benchmark whose throughput dropped more than tolerance below the baseline'''
+    with open(baseline_path, 'r') as f:
+        baseline = {(entry['benchmark'], entry['num_records']): entry for entry in json.load(f)['results']}
+    regressions = []
+    print(f'Compared with {baseline_path}:')
+    for entry in results:
+        before = baseline.get((entry['benchmark'], entry['num_records']))
+        if before is None:
+            continue
+        ratio = entry['records_per_sec'] / before['records_per_sec']
+        print(f'{entry["benchmark"]:<45}{entry["num_records"]:>9}{ratio:>9.2f}x')
+        if ratio < 1 - tolerance:
+            regressions.append(f'{entry["benchmark"]} with {entry["num_records"]} records: {before["records_per_sec"]:.1f} -> '
+                               f'{entry["records_per_sec"]:.1f} records/sec ({ratio:.2f}x)')
+    return regressions
+
+def main(args: Namespace):
+    results = run_benchmarks(args)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {name: value for name, value in vars(args).items() if name not in ('output', 'baseline', 'tolerance')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            raise SystemExit(f'{len(regressions)} benchmarks are more than {args.tolerance:.0%} slower than the baseline:\n' + '\n'.join(regressions))
+
+if __name__ == "__main__":
+    args_parser = ArgumentParser()
+    args_parser.add_argument('--num_records', type=int, nargs='+', default=[1000, 5000])
+    args_parser.add_argument('--methods', type=str, nargs='+', choices=get_choise_flag(), default=get_choise_flag())
+    args_parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the fastest is kept')
+    args_parser.add_argument('--seed', type=int, default=42)
+    args_parser.add_argument('--mean_words', type=int, default=60)
+    args_parser.add_argument('--emoji_rate', type=float, default=0.02)
+    args_parser.add_argument('--html_rate', type=float, default=0.02)
+    args_parser.add_argument('--url_rate', type=float, default=0.005)
+    args_parser.add_argument('--contraction_rate', type=float, default=0.03)
+    args_parser.add_argument('--output', type=str, default='benchmark_results.json', help='json file the results are saved to')
+    args_parser.add_argument('--baseline', type=str, default=None, help='results json of an earlier run to compare against')
+    args_parser.add_argument('--tolerance', type=float, default=0.2, help='allowed throughput drop against the baseline, 0.2 is 20%%')
+    args = args_parser.parse_args()
+    main(args)
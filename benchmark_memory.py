@@ -0,0 +1,70 @@
+import gc
+import json
+import tracemalloc
+
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass
+
+from src.data import Data, DataBatch
+from src.synthetic import generate_reviews
+
+@dataclass
+class DictData:
+    '''The record layout before Data used __slots__, kept to compare against'''
+    index: str
+    rating: int
+    title: str
+    text: str
+    helpful_vote: int
+    verified_purchase: bool
+    processed_text: str
+
+def to_records(cls, records: list[dict]):
+    for index, d in enumerate(records):
+        yield cls(
+            index=f'index_{index}',
+            rating=int(d['rating']),
+            title=d['title'],
+            text=d['text'],
+            helpful_vote=d['helpful_vote'],
+            verified_purchase=d['verified_purchase'],
+            processed_text=f'Review title is {d["title"]} [SEP] {d["text"]}'
+        )
+
+def load_before(blob: str):
+    records = json.loads(blob)
+    return records, list(to_records(DictData, records))
+
+def measure(build) -> int:
+    '''Bytes still allocated by what build returns'''
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+def main(args: Namespace):
+    print(f'{"Layout":<34}{"Bytes/record":>14}{"Total MB":>12}{"vs before":>10}')
+    for num_records in args.num_records:
+        # every layout parses the json itself so the strings it keeps are counted
+        blob = json.dumps(list(generate_reviews(num_records, args.seed)))
+        layouts = {
+            'json dicts + dataclass (before)': lambda: load_before(blob),
+            'slots Data list': lambda: list(to_records(Data, json.loads(blob))),
+            'DataBatch': lambda: DataBatch.from_data(to_records(Data, json.loads(blob))),
+        }
+        print(f'{num_records} records')
+        baseline = None
+        for name, build in layouts.items():
+            size = measure(build)
+            baseline = baseline or size
+            print(f'{name:<34}{size / num_records:>14.1f}{size / 2 ** 20:>12.1f}{baseline / size:>9.1f}x')
+
+if __name__ == "__main__":
+    args_parser = ArgumentParser()
+    args_parser.add_argument('--num_records', type=int, nargs='+', default=[10_000, 100_000])
+    args_parser.add_argument('--seed', type=int, default=42)
+    args = args_parser.parse_args()
+    main(args)
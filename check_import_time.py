@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+from argparse import ArgumentParser, Namespace
+
+# module imported by each script and its budget in milliseconds for the cumulative import time
+BUDGETS_MS = {'preprocess': 120, 'analyze': 60, 'create_datasets': 100}
+# packages that must only be imported by the code paths that use them
+HEAVY_PACKAGES = ['bs4', 'lxml', 'emoji', 'soupsieve', 'datasets', 'transformers', 'matplotlib', 'numpy', 'pyarrow', 'pandas', 'torch']
+
+def import_times(module: str) -> dict[str, int]:
+    '''Cumulative import time in microseconds of every module imported by a fresh `python -X importtime -c "import module"`'''
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise SystemExit(f'import {module} failed:\n{process.stderr}')
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+def check_module(module: str, budget_ms: float, repeat: int) -> list[str]:
+    '''Messages for a module over its budget, the fastest of repeat runs is kept, or importing a heavy package'''
+    runs = [import_times(module) for _ in range(repeat)]
+    elapsed_ms = min(times[module] for times in runs) / 1000
+    heavy = sorted({name.split('.')[0] for name in runs[0]} & set(HEAVY_PACKAGES))
+    print(f'{module:<20}{elapsed_ms:>10.1f} ms{budget_ms:>10.1f} ms budget')
+    failures = []
+    if elapsed_ms > budget_ms:
+        failures.append(f'import {module} took {elapsed_ms:.1f} ms, over its {budget_ms:.1f} ms budget')
+    if heavy:
+        failures.append(f'import {module} imports {", ".join(heavy)}')
+    return failures
+
+def main(args: Namespace):
+    failures = []
+    for module in args.modules:
+        failures += check_module(module, BUDGETS_MS[module] * args.budget_scale, args.repeat)
+    if failures:
+        raise SystemExit('\n'.join(failures))
+
+if __name__ == "__main__":
+    args_parser = ArgumentParser()
+    args_parser.add_argument('--modules', type=str, nargs='+', choices=list(BUDGETS_MS), default=list(BUDGETS_MS))
+    args_parser.add_argument('--repeat', type=int, default=5, help='imports per module, the fastest is kept')
+    args_parser.add_argument('--budget_scale', type=float, default=1.0, help='multiplies every budget, for slower machines')
+    args = args_parser.parse_args()
+    main(args)
@@ -1,13 +1,139 @@
+import os
+import re
+import time
+
 from argparse import ArgumentParser, Namespace
-from datasets import load_dataset, Dataset
+
+from src.process_method import get_processed_method, get_choise_flag
+from src.tokens import NUM_TOKENS_COLUMN, INPUT_IDS_COLUMN
+from src.writer import split_paths, import_pyarrow, PARQUET_FORMAT, ARROW_FORMAT
+
+SPLITS = ['train', 'validation', 'test']
+
+# the columns after the text, a record ends with them and a newline, so the text itself may hold tabs and newlines
+TSV_TRAILING_PATTERNS = {'label': r'-?\d+', 'helpful_vote': r'-?\d+', 'verified_purchase': r'True|False', NUM_TOKENS_COLUMN: r'\d+'}
+
+def read_tsv(path: str) -> dict[str, list]:
+    '''Columns of a tsv written by preprocess.py, records are found by their trailing columns so tabs and newlines in the text are kept'''
+    with open(path, 'r', newline='') as f:
+        content = f.read()
+    header, _, body = content.partition('\n')
+    header = header.split('\t')
+    trailing = ''.join(rf'\t({TSV_TRAILING_PATTERNS[name]})' for name in header[2:])
+    record = re.compile(rf'([^\t\n]*)\t(.*?){trailing}(?:\n|$)', re.DOTALL)
+    columns = {name: [] for name in header}
+    position = 0
+    while position < len(body):
+        match = record.match(body, position)
+        if match is None:
+            raise ValueError(f'{path} has a malformed record after {len(columns["index"])} records')
+        for name, value in zip(header, match.groups()):
+            if name in ('index', 'text'):
+                columns[name].append(value)
+            else:
+                columns[name].append(value == 'True' if name == 'verified_purchase' else int(value))
+        position = match.end()
+    return columns
+
+def read_split(paths: list[str]):
+    '''One arrow table of the shards of a split, in any of the preprocess.py output formats'''
+    pa = import_pyarrow()
+    tables = []
+    for path in paths:
+        if path.endswith(f'.{PARQUET_FORMAT}'):
+            import pyarrow.parquet
+            tables.append(pyarrow.parquet.read_table(path))
+        elif path.endswith(f'.{ARROW_FORMAT}'):
+            with pa.memory_map(path) as source:
+                tables.append(pa.ipc.open_stream(source).read_all())
+        else:
+            tables.append(pa.table(read_tsv(path)))
+    return pa.concat_tables(tables, promote_options='permissive')
+
+def build_features(column_names: list[str], label_names: list[str]):
+    '''The columns written by preprocess.py with explicit types, label is a ClassLabel of the processed method's labels'''
+    from datasets import ClassLabel, Features, Sequence, Value
+    features = {
+        'index': Value('string'),
+        'text': Value('string'),
+        'label': ClassLabel(names=label_names),
+        'helpful_vote': Value('int64'),
+        'verified_purchase': Value('bool'),
+    }
+    if NUM_TOKENS_COLUMN in column_names:
+        features[NUM_TOKENS_COLUMN] = Value('int32')
+    if INPUT_IDS_COLUMN in column_names:
+        features[INPUT_IDS_COLUMN] = Sequence(Value('int32'))
+    return Features(features)
+
+def build_dataset_dict(hf_folder: str, label_names: list[str]):
+    '''
+    DatasetDict of the splits preprocess.py wrote to hf_folder/data, read straight from its files instead of through
+    load_dataset and its cache. Test records keep the label -1, which ClassLabel allows for a missing label.
+    '''
+    import datasets
+    import pyarrow.compute as pc
+    from datasets.table import InMemoryTable
+    splits = {}
+    for split in SPLITS:
+        paths = split_paths(hf_folder, split)
+        if not paths:
+            continue
+        table = read_split(paths)
+        features = build_features(table.column_names, label_names)
+        labels = pc.min_max(table['label']).as_py()
+        if table.num_rows and (labels['min'] < -1 or labels['max'] >= len(label_names)):
+            raise ValueError(f'the {split} labels of {hf_folder} run from {labels["min"]} to {labels["max"]}, but the processed method '
+                             f'has {len(label_names)} labels, was it written with another processed method?')
+        table = table.select(list(features)).cast(features.arrow_schema)
+        splits[split] = datasets.Dataset(InMemoryTable(table), info=datasets.DatasetInfo(features=features), split=datasets.NamedSplit(split))
+    if not splits:
+        raise FileNotFoundError(f'no split files written by preprocess.py in {os.path.join(hf_folder, "data")}')
+    return datasets.DatasetDict(splits)
+
+def disk_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def save_to_disk(args: Namespace):
+    '''Build the DatasetDict, save it as arrow files, and load it back memory mapped, returns the loaded DatasetDict'''
+    import datasets
+    start = time.perf_counter()
+    label_names = get_processed_method(args.processed_method).label_table.names
+    dataset = build_dataset_dict(args.hf_folder, label_names)
+    dataset.save_to_disk(args.save_to_disk, max_shard_size=args.max_shard_size, num_proc=args.num_proc)
+    elapsed = time.perf_counter() - start
+    rows = ', '.join(f'{split} {split_dataset.num_rows}' for split, split_dataset in dataset.items())
+    print(f'Built {args.save_to_disk} in {elapsed:.2f}s ({rows} rows), {disk_size(args.save_to_disk) / 2 ** 20:.1f} MB on disk')
+
+    start = time.perf_counter()
+    loaded = datasets.load_from_disk(args.save_to_disk)
+    # a dataset read from its arrow files lists them as cache files, one held in memory has none
+    memory_mapped = all(split_dataset.cache_files for split_dataset in loaded.values())
+    print(f'Loaded it back in {time.perf_counter() - start:.3f}s, memory mapped: {memory_mapped}')
+    return loaded
 
 def main(args: Namespace):
-    dataset: Dataset = load_dataset(args.hf_folder)
-    dataset.push_to_hub(args.upload_name)
-    
+    if args.save_to_disk is not None:
+        dataset = save_to_disk(args)
+    else:
+        from datasets import load_dataset
+        dataset = load_dataset(args.hf_folder)
+    if args.upload_name is not None:
+        dataset.push_to_hub(args.upload_name)
+
 if __name__ == "__main__":
     arg_parser = ArgumentParser()
     arg_parser.add_argument('--hf_folder', type=str, required=True)
-    arg_parser.add_argument('--upload_name', type=str, required=True)
+    arg_parser.add_argument('--upload_name', type=str, default=None, help='push the dataset to this hub repository')
+    arg_parser.add_argument('--save_to_disk', type=str, default=None,
+                            help='folder to save the dataset to as arrow files, which datasets.load_from_disk memory maps')
+    arg_parser.add_argument('--processed_method', type=str, choices=get_choise_flag(), default=None,
+                            help='processed method hf_folder was written with, it names the labels of --save_to_disk')
+    arg_parser.add_argument('--max_shard_size', type=str, default='500MB', help='largest arrow file written by --save_to_disk')
+    arg_parser.add_argument('--num_proc', type=int, default=None, help='processes writing the --save_to_disk shards')
     args = arg_parser.parse_args()
-    main(args)
\ No newline at end of file
+    if args.save_to_disk is None and args.upload_name is None:
+        arg_parser.error('give --save_to_disk, --upload_name or both')
+    if args.save_to_disk is not None and args.processed_method is None:
+        arg_parser.error('--save_to_disk needs --processed_method')
+    main(args)
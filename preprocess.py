@@ -1,20 +1,27 @@
+import functools
+import itertools
+import os
 import random
 
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from typing import Iterable, Iterator
 
-from src.utils import set_seed, overwrite_folder, read_train_json, read_test_json, write_csv
-from src.data import Data
-from src.process_method import ProcessMethod, get_processed_method, get_choise_flag
+from src.utils import set_seed, overwrite_folder, read_train_json, read_test_json, parallel_map
+from src.writer import write_split, SplitWriter, OUTPUT_FORMATS, TSV_FORMAT
+from src.data import Data, DataBatch
+from src.process_method import ProcessMethod, get_processed_method, get_choise_flag, ALL_FLAG
+from src.clean import text_preprocessing_pipeline, clean_fingerprint, EMOJI_MODES, EMOJI_MODE_STRIP
+from src.cache import CleanCache, DEFAULT_MAX_ENTRIES
+from src.profiler import Profiler
+from src.dedup import Deduplicator, DEFAULT_NUM_PERM
+from src.manifest import Manifest, record_key
+from src.tokens import TokenCounter
+from src.split import (hash_split, buffered_shuffle, HashSplitter, ShuffleBuffer, SPLIT_MODES, SHUFFLE_SPLIT_MODE, HASH_SPLIT_MODE,
+                       SPLIT_KEYS, CONTENT_SPLIT_KEY)
 
-def main(args: Namespace):
-    set_seed(args.seed)
-    overwrite_folder(args.output_dir)
-
-    process_method: ProcessMethod = get_processed_method(args.processed_method)
-    train_data: list[Data] = []
-    temp_data = read_train_json(args.train_json)
-    for index, d in enumerate(temp_data):
-        train_data.append(Data(
+def read_train_data(json_path: str) -> Iterator[Data]:
+    for index, d in enumerate(read_train_json(json_path)):
+        yield Data(
             index=f'index_{index}',
             rating=int(d['rating']),
             title=d['title'],
@@ -22,22 +29,11 @@ def main(args: Namespace):
             helpful_vote=d['helpful_vote'],
             verified_purchase=d['verified_purchase'],
             processed_text=None
-        ))
+        )
 
-    original_data = process_method.process_train_dataset(train_data)
-    
-    random.shuffle(original_data)
-    train_data_len = int(len(original_data) * args.train_valid_ratio)
-    train_data = original_data[:train_data_len]
-    valid_data = original_data[train_data_len:]
-
-    write_csv(train_data, args.output_dir, 'train.tsv')
-    write_csv(valid_data, args.output_dir, 'validation.tsv')
-
-    test_data: list[Data] = []
-    temp_data = read_test_json(args.test_json)
-    for index, d in enumerate(temp_data):
-        test_data.append(Data(
+def read_test_data(json_path: str) -> Iterator[Data]:
+    for index, d in enumerate(read_test_json(json_path)):
+        yield Data(
             index=f'index_{index}',
             rating=0,
             title=d['title'],
@@ -45,11 +41,221 @@ def main(args: Namespace):
             helpful_vote=d['helpful_vote'],
             verified_purchase=d['verified_purchase'],
             processed_text=None
-        ))
+        )
+
+def parse_processed_methods(value: str) -> list[str]:
+    '''Parse "all" or a comma separated list of processed method flags'''
+    flags = get_choise_flag() if value == ALL_FLAG else [flag.strip() for flag in value.split(',')]
+    for flag in flags:
+        if flag not in get_choise_flag():
+            raise ArgumentTypeError(f'invalid processed method {flag!r}, choose from {ALL_FLAG}, {", ".join(get_choise_flag())}')
+    return list(dict.fromkeys(flags))
+
+def write_hash_split(processed_data: Iterable[Data], args: Namespace, output_dir: str, profiler: Profiler, dedup: Deduplicator | None,
+                     tokenizer: TokenCounter | None):
+    '''
+    Stream every record to the train or validation file HashSplitter assigns it to, holding at most the shuffle buffers in memory.
+    Duplicates are dropped, or with --keep_duplicates sent to the split of the first record of their group.
+    '''
+    splitter = HashSplitter(args.seed, args.train_valid_ratio, args.split_key, args.stratify)
+    buffers = {split: ShuffleBuffer(args.shuffle_buffer_size, args.seed) for split in ('train', 'validation')} if args.shuffle_buffer_size else None
+    with profiler.phase('write'), \
+         SplitWriter(output_dir, 'train', args.output_format, args.shard_size, tokenizer, args.length_buckets) as train_writer, \
+         SplitWriter(output_dir, 'validation', args.output_format, args.shard_size, tokenizer, args.length_buckets) as valid_writer:
+        writers = {'train': train_writer, 'validation': valid_writer}
+        for d in processed_data:
+            key = splitter.key(d)
+            if dedup is not None:
+                group_key = dedup.find(d, key)
+                if group_key is not None:
+                    if not args.keep_duplicates:
+                        continue
+                    key = group_key
+            split = splitter(d, key)
+            if buffers is not None:
+                d = buffers[split].push(d)
+                if d is None:
+                    continue
+            writers[split].append(d)
+        if buffers is not None:
+            for split, writer in writers.items():
+                writer.extend(buffers[split].drain())
+
+def write_train_and_valid(processed_data: Iterable[Data], args: Namespace, output_dir: str, profiler: Profiler, tokenizer: TokenCounter | None):
+    dedup = None
+    if args.dedup or args.near_dedup_threshold is not None:
+        dedup = Deduplicator(args.near_dedup_threshold, args.dedup_num_perm, args.seed)
+    if args.split_mode == HASH_SPLIT_MODE:
+        write_hash_split(processed_data, args, output_dir, profiler, dedup, tokenizer)
+    else:
+        write_shuffle_split(processed_data, args, output_dir, profiler, dedup, tokenizer)
+    if dedup is not None:
+        print(f'Deduplicated {output_dir}: {dedup.summary()}, duplicates were {"kept" if args.keep_duplicates else "dropped"}')
+        dedup.close()
+
+def write_shuffle_split(processed_data: Iterable[Data], args: Namespace, output_dir: str, profiler: Profiler, dedup: Deduplicator | None,
+                        tokenizer: TokenCounter | None):
+    # the train split has to be shuffled so it is collected, into a compact columnar batch without the raw title and text
+    with profiler.phase('process'):
+        if dedup is not None:
+            processed_data = dedup.drop_duplicates(processed_data)
+        if isinstance(processed_data, DataBatch) and not processed_data.keep_raw_text:
+            original_data = processed_data
+        else:
+            original_data = DataBatch.from_data(processed_data, keep_raw_text=False)
+    
+    # shuffling positions gives the same permutation as shuffling the records themselves
+    with profiler.phase('shuffle/split'):
+        set_seed(args.seed)
+        order = list(range(len(original_data)))
+        random.shuffle(order)
+        train_data_len = int(len(original_data) * args.train_valid_ratio)
+    train_data = (original_data[position] for position in order[:train_data_len])
+    valid_data = (original_data[position] for position in order[train_data_len:])
+
+    with profiler.phase('write'):
+        write_split(train_data, output_dir, 'train', args.output_format, args.shard_size, tokenizer, args.length_buckets)
+        write_split(valid_data, output_dir, 'validation', args.output_format, args.shard_size, tokenizer, args.length_buckets)
+
+def profile_records(process_method: ProcessMethod, profiler: Profiler):
+    '''Time every record the method processes, only possible when it processes them in this process'''
+    if profiler.installed:
+        process_method.process_train = profiler.wrap_record(process_method.process_train, 'train')
+        process_method.process_test = profiler.wrap_record(process_method.process_test, 'test')
+
+def report_tokens(tokenizer: TokenCounter | None, output_dir: str):
+    '''Print the token lengths of the splits written to output_dir, and how many are longer than the max length'''
+    if tokenizer is not None:
+        print(f'Token lengths of {output_dir}:\n{tokenizer.summary()}')
+        tokenizer.reset()
+
+def process_one_method(flag: str, clean, args: Namespace, profiler: Profiler, tokenizer: TokenCounter | None):
+    process_method: ProcessMethod = get_processed_method(flag, args.workers, args.chunk_size, clean)
+    profile_records(process_method, profiler)
+    train_data = profiler.iterate('read', read_train_data(args.train_json))
+    write_train_and_valid(profiler.iterate('process', process_method.process_train_dataset(train_data)), args, args.output_dir, profiler, tokenizer)
+
+    # the test split streams from file to writer
+    test_data = profiler.iterate('read', read_test_data(args.test_json))
+    test_data = profiler.iterate('process', process_method.process_test_dataset(test_data))
+    with profiler.phase('write'):
+        write_split(test_data, args.output_dir, 'test', args.output_format, args.shard_size, tokenizer, args.length_buckets)
+    report_tokens(tokenizer, args.output_dir)
+
+def process_many_methods(flags: list[str], clean, args: Namespace, profiler: Profiler, tokenizer: TokenCounter | None):
+    '''
+    Read the json files once and write one output folder per processed method.
+    Every distinct title and text is cleaned once, in parallel, and shared by the methods that clean,
+    which then only assemble strings so they run in this process.
+    '''
+    with profiler.phase('read'):
+        train_data = DataBatch.from_data(read_train_data(args.train_json))
+        test_data = DataBatch.from_data(read_test_data(args.test_json))
+
+    process_methods = [get_processed_method(flag) for flag in flags]
+    if any(process_method.uses_clean for process_method in process_methods):
+        with profiler.phase('process'):
+            texts = list(dict.fromkeys(itertools.chain(train_data.title, train_data.text, test_data.title, test_data.text)))
+            cleaned_texts = dict(zip(texts, parallel_map(clean, texts, args.workers, args.chunk_size)))
+        for process_method in process_methods:
+            process_method.clean = cleaned_texts.__getitem__
+
+    for flag, process_method in zip(flags, process_methods):
+        output_dir = os.path.join(args.output_dir, flag)
+        profile_records(process_method, profiler)
+        # batches hand out fresh records, so the methods updating them in place do not affect each other
+        with profiler.phase('process'):
+            # only near deduplication reads the raw title and text once a record is processed
+            processed_train_data = process_method.process_train_batch(train_data, keep_raw_text=args.near_dedup_threshold is not None)
+            processed_test_data = process_method.process_test_batch(test_data, keep_raw_text=False)
+        write_train_and_valid(processed_train_data, args, output_dir, profiler, tokenizer)
+        with profiler.phase('write'):
+            write_split(processed_test_data, output_dir, 'test', args.output_format, args.shard_size, tokenizer, args.length_buckets)
+        report_tokens(tokenizer, output_dir)
+
+def update_manifest(manifest: Manifest, process_dataset, data: Iterable[Data], split: str, profiler: Profiler) -> tuple[list[bytes], int]:
+    '''Process the records of data missing from the manifest, returns the keys of all records in input order and the number processed'''
+    keys = []
+    new_data = {}
+    for d in profiler.iterate('read', data):
+        key = record_key(d, split)
+        keys.append(key)
+        if key not in new_data and key not in manifest:
+            new_data[key] = d
+
+    key_by_index = {d.index: key for key, d in new_data.items()}
+    processed = {}
+    for d in profiler.iterate('process', process_dataset(new_data.values())):
+        processed[key_by_index[d.index]] = d
+    manifest.put((key, processed.get(key)) for key in new_data)
+    return keys, len(new_data)
+
+def manifest_rows(manifest: Manifest, keys: list[bytes], split: str | None = None, args: Namespace | None = None) -> Iterator[Data]:
+    '''The processed records of keys in order, only those hash_split assigns to split when it is given'''
+    for position, key in enumerate(keys):
+        if split is not None and hash_split(key, args.seed, args.train_valid_ratio) != split:
+            continue
+        data = manifest.get(key, f'index_{position}')
+        if data is not None:
+            yield data
+
+def process_incremental(flag: str, clean, args: Namespace, output_dir: str, profiler: Profiler, tokenizer: TokenCounter | None):
+    '''
+    Process only the records that are not yet in the manifest of output_dir, then rewrite its splits from the manifest.
+    Train and validation are assigned by hash_split of each record's content, so adding records never moves existing ones.
+    '''
+    process_method: ProcessMethod = get_processed_method(flag, args.workers, args.chunk_size, clean)
+    profile_records(process_method, profiler)
+    manifest = Manifest(output_dir, f'{flag} {process_method.spec.fingerprint()} {clean_fingerprint(args.emoji_mode)}')
+    train_keys, new_train = update_manifest(manifest, process_method.process_train_dataset, read_train_data(args.train_json), 'train', profiler)
+    test_keys, new_test = update_manifest(manifest, process_method.process_test_dataset, read_test_data(args.test_json), 'test', profiler)
+    removed = manifest.keep_only(itertools.chain(train_keys, test_keys))
+
+    with profiler.phase('write'):
+        for split in ('train', 'validation'):
+            rows = manifest_rows(manifest, train_keys, split, args)
+            if args.shuffle_buffer_size:
+                rows = buffered_shuffle(rows, args.shuffle_buffer_size, args.seed)
+            write_split(rows, output_dir, split, args.output_format, args.shard_size, tokenizer, args.length_buckets)
+        write_split(manifest_rows(manifest, test_keys), output_dir, 'test', args.output_format, args.shard_size, tokenizer, args.length_buckets)
+    manifest.close()
+    print(f'{flag}: processed {new_train} train and {new_test} test records, '
+          f'reused {len(train_keys) + len(test_keys) - new_train - new_test}, forgot {removed}')
+    report_tokens(tokenizer, output_dir)
+
+def main(args: Namespace):
+    if not args.incremental:
+        overwrite_folder(args.output_dir)
+
+    profiler = Profiler(args.profile, args.profile_slowest)
+    clean = functools.partial(text_preprocessing_pipeline, emoji_mode=args.emoji_mode)
+    if args.profile and args.workers > 1:
+        print('Profiling with more than one worker only times the phases, the cleaning stages and records run in the workers')
+    elif args.profile:
+        profiler.install()
+        clean = profiler.wrap_stage('text_preprocessing_pipeline', clean)
+    if args.cache_path is not None:
+        clean = CleanCache(args.cache_path, args.cache_max_entries, clean, clean_fingerprint(args.emoji_mode))
+    tokenizer = None
+    if args.tokenizer_path is not None:
+        tokenizer = TokenCounter(args.tokenizer_path, args.max_length, args.input_ids)
+
+    if args.incremental:
+        for flag in args.processed_method:
+            output_dir = args.output_dir if len(args.processed_method) == 1 else os.path.join(args.output_dir, flag)
+            process_incremental(flag, clean, args, output_dir, profiler, tokenizer)
+    elif len(args.processed_method) == 1:
+        process_one_method(args.processed_method[0], clean, args, profiler, tokenizer)
+    else:
+        process_many_methods(args.processed_method, clean, args, profiler, tokenizer)
 
-    test_data = process_method.process_test_dataset(test_data)
+    if isinstance(clean, CleanCache):
+        clean.close()
 
-    write_csv(test_data, args.output_dir, 'test.tsv')
+    if args.profile:
+        profiler.uninstall()
+        profiler.show()
+        profiler.save(args.profile_output)
 
 if __name__ == "__main__":
     args_parser = ArgumentParser()
@@ -58,6 +264,56 @@ if __name__ == "__main__":
     args_parser.add_argument('--output_dir', type=str, required=True)
     args_parser.add_argument('--train_valid_ratio', type=float, required=True)
     args_parser.add_argument('--seed', type=int, default=42, required=True)
-    args_parser.add_argument('--processed_method', type=str, choices=get_choise_flag(), required=True)
+    args_parser.add_argument('--processed_method', type=parse_processed_methods, required=True,
+                             help=f'one of {", ".join(get_choise_flag())}, a comma separated list of them or {ALL_FLAG}, '
+                                  'several methods are written to one sub folder each')
+    args_parser.add_argument('--emoji_mode', type=str, choices=EMOJI_MODES, default=EMOJI_MODE_STRIP,
+                             help='strip deletes emoji codepoints, demojize is the former behaviour that also drops any text between two colons')
+    args_parser.add_argument('--workers', type=int, default=1, help='number of processes used to process the records')
+    args_parser.add_argument('--chunk_size', type=int, default=None, help='records sent to a worker at a time, picked from the data size by default')
+    args_parser.add_argument('--cache_path', type=str, default=None, help='sqlite file caching cleaned text across runs and processed methods')
+    args_parser.add_argument('--cache_max_entries', type=int, default=DEFAULT_MAX_ENTRIES)
+    args_parser.add_argument('--output_format', type=str, choices=OUTPUT_FORMATS, default=TSV_FORMAT,
+                             help='parquet and arrow are columnar files that datasets loads without parsing text')
+    args_parser.add_argument('--shard_size', type=int, default=None, help='start a new output file every shard_size records')
+    args_parser.add_argument('--split_mode', type=str, choices=SPLIT_MODES, default=SHUFFLE_SPLIT_MODE,
+                             help='shuffle collects and shuffles the train records, hash streams each record to its split by a seeded hash')
+    args_parser.add_argument('--split_key', type=str, choices=SPLIT_KEYS, default=CONTENT_SPLIT_KEY,
+                             help='what the hash split hashes, the processed text or the index')
+    args_parser.add_argument('--stratify', action='store_true', help='keep the train_valid_ratio for every label in the hash split')
+    args_parser.add_argument('--shuffle_buffer_size', type=int, default=0,
+                             help='randomize the order of the hash and incremental splits with a buffer of this many records')
+    args_parser.add_argument('--incremental', action='store_true',
+                             help='keep the output folder and only process records missing from its manifest, splits are assigned by a seeded hash')
+    args_parser.add_argument('--profile', action='store_true', help='time every phase and cleaning stage and report the slowest records')
+    args_parser.add_argument('--profile_slowest', type=int, default=10, help='number of slowest records reported by --profile')
+    args_parser.add_argument('--profile_output', type=str, default='profile.json', help='json file the --profile report is saved to')
+    args_parser.add_argument('--dedup', action='store_true', help='drop train records whose processed text was already seen')
+    args_parser.add_argument('--near_dedup_threshold', type=float, default=None,
+                             help='also drop near duplicates, train records whose title and text have at least this estimated jaccard similarity to an earlier one')
+    args_parser.add_argument('--dedup_num_perm', type=int, default=DEFAULT_NUM_PERM, help='minhash permutations used for near duplicates')
+    args_parser.add_argument('--keep_duplicates', action='store_true', help='keep duplicates, in the same hash split as the record they duplicate')
+    args_parser.add_argument('--tokenizer_path', type=str, default=None,
+                             help='local tokenizer folder, adds a num_tokens column and reports the token lengths of every split')
+    args_parser.add_argument('--max_length', type=int, default=None,
+                             help='token length the report counts longer texts against, the tokenizer model_max_length by default')
+    args_parser.add_argument('--input_ids', action='store_true', help='also store the untruncated input_ids column, parquet and arrow only')
+    args_parser.add_argument('--length_buckets', type=int, nargs='+', default=None,
+                             help='write each split as one shard per token length bucket, e.g. 64 128 256 gives shards of up to 64, 128, '
+                                  '256 and more tokens')
     args = args_parser.parse_args()
+    if args.keep_duplicates and (args.split_mode != HASH_SPLIT_MODE or args.stratify):
+        args_parser.error('--keep_duplicates needs --split_mode hash without --stratify, which puts every duplicate group in one split')
+    if (args.dedup or args.near_dedup_threshold is not None) and args.incremental:
+        args_parser.error('--dedup and --near_dedup_threshold are not supported with --incremental')
+    if args.incremental and (args.split_mode != SHUFFLE_SPLIT_MODE or args.split_key != CONTENT_SPLIT_KEY or args.stratify):
+        args_parser.error('--split_mode, --split_key and --stratify are not supported with --incremental, which splits by a seeded hash of each review')
+    if args.tokenizer_path is None and (args.max_length is not None or args.input_ids or args.length_buckets):
+        args_parser.error('--max_length, --input_ids and --length_buckets need --tokenizer_path')
+    if args.input_ids and args.output_format == TSV_FORMAT:
+        args_parser.error('--input_ids needs --output_format parquet or arrow')
+    if args.length_buckets and args.shard_size:
+        args_parser.error('--length_buckets already shards every split and cannot be combined with --shard_size')
+    if args.length_buckets:
+        args.length_buckets = sorted(set(args.length_buckets))
     main(args)
\ No newline at end of file
@@ -3,6 +3,9 @@ ORIGINAL_TEST_JSON="original_datasets/test.json"
 OUTPUT_DIR="hf_datasets"
 TRAIN_VALID_RATIO=0.8
 SEED=42
+WORKERS=1
+CACHE_PATH=".cache/clean_cache.db"
+OUTPUT_FORMAT="parquet" # tsv, parquet or arrow
 
 PROCESSED_METHOD="clean_merge_all_feature_to_text"
 # Available processed methods
@@ -13,8 +16,10 @@ PROCESSED_METHOD="clean_merge_all_feature_to_text"
 # 5. only_12_star_only_title_and_text
 # 6. only_45_star_only_title_and_text
 # 7. group_12_and_45_only_title_and_text
+# Use "all" or a comma separated list to build several at once from one read of the json files,
+# each one is then written to $OUTPUT_DIR/<processed method> and uploaded as review_<method without underscores>
 
-UPLOAD_NAME="review_cleanmergeallfeaturetotext"
+UPLOAD_NAME="review_cleanmergeallfeaturetotext" # only used with a single processed method
 # Available upload names
 # 1. review_onlytitleandtext
 # 2. review_cleanonlytitleandtext
@@ -26,7 +31,21 @@ UPLOAD_NAME="review_cleanmergeallfeaturetotext"
 
 python preprocess.py \
     --train_json $ORIGINAL_TRAIN_JSON --test_json $ORIGINAL_TEST_JSON --output_dir $OUTPUT_DIR \
-    --train_valid_ratio $TRAIN_VALID_RATIO --seed $SEED --processed_method $PROCESSED_METHOD
+    --train_valid_ratio $TRAIN_VALID_RATIO --seed $SEED --processed_method $PROCESSED_METHOD --workers $WORKERS \
+    --cache_path $CACHE_PATH --output_format $OUTPUT_FORMAT
 
-python create_datasets.py \
-    --hf_folder $OUTPUT_DIR --upload_name $UPLOAD_NAME
\ No newline at end of file
+if [ "$PROCESSED_METHOD" = "all" ]; then
+    METHODS=$(python -c "from src.process_method import get_choise_flag; print(' '.join(get_choise_flag()))")
+else
+    METHODS=${PROCESSED_METHOD//,/ }
+fi
+
+if [ "$METHODS" = "$PROCESSED_METHOD" ]; then
+    python create_datasets.py \
+        --hf_folder $OUTPUT_DIR --upload_name $UPLOAD_NAME
+else
+    for METHOD in $METHODS; do
+        python create_datasets.py \
+            --hf_folder $OUTPUT_DIR/$METHOD --upload_name review_${METHOD//_/}
+    done
+fi
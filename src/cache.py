@@ -0,0 +1,121 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+from .clean import clean_fingerprint, text_preprocessing_pipeline
+
+DEFAULT_MAX_ENTRIES = 10_000_000
+# buffered misses and hits written in one transaction
+WRITE_BATCH_SIZE = 1000
+# a hit only refreshes the last use of an entry older than this, so a run repeated soon after writes nothing
+REFRESH_SECONDS = 3600
+
+class CleanCache:
+    '''
+    Persistent cache of cleaned text in a SQLite file, shared across runs and process methods.
+    Entries are keyed by a hash of the input text plus the fingerprint of the cleaning tables, code and emoji mode
+    of src/clean.py, and the file is emptied when that fingerprint changes.
+    Misses are buffered, and written with the time of the hits in one transaction every WRITE_BATCH_SIZE texts,
+    after every parallel_map chunk and on close. Once it holds more than max_entries the least recently used
+    entries, to within REFRESH_SECONDS, are evicted first.
+    '''
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES, clean=text_preprocessing_pipeline, fingerprint: str | None = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.clean = clean
+        self.fingerprint = fingerprint or clean_fingerprint()
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._written = {} # cleaned text of the misses not written yet, by key
+        self._used = set() # keys of the hits not refreshed yet
+        self._refresh_before = time.time() - REFRESH_SECONDS
+
+    def __getstate__(self):
+        # every process opens its own connection and buffers its own writes
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_written'] = {}
+        state['_used'] = set()
+        return state
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._check_fingerprint()
+        return self._connection
+
+    def _check_fingerprint(self):
+        with self._connection:
+            self._connection.execute('BEGIN IMMEDIATE')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            columns = [row[1] for row in self._connection.execute('PRAGMA table_info(cleaned)')]
+            if columns and 'used' not in columns:
+                self._connection.execute('DROP TABLE cleaned') # written before entries had a last use time
+            self._connection.execute('CREATE TABLE IF NOT EXISTS cleaned (key BLOB UNIQUE NOT NULL, value TEXT NOT NULL, used REAL NOT NULL)')
+            row = self._connection.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+            if row is None or row[0] != self.fingerprint:
+                self._connection.execute('DELETE FROM cleaned')
+                self._connection.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (self.fingerprint,))
+
+    def key(self, text: str) -> bytes:
+        digest = hashlib.blake2b(self.fingerprint.encode(), digest_size=16)
+        digest.update(text.encode('utf-8', 'surrogatepass'))
+        return digest.digest()
+
+    def __call__(self, text: str) -> str:
+        key = self.key(text)
+        cleaned = self._written.get(key)
+        if cleaned is not None:
+            self.hits += 1
+            return cleaned
+        row = self.connection.execute('SELECT value, used FROM cleaned WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            self.hits += 1
+            cleaned, used = row
+            if used < self._refresh_before:
+                self._used.add(key)
+        else:
+            self.misses += 1
+            cleaned = self.clean(text)
+            self._written[key] = cleaned
+        if len(self._written) + len(self._used) >= WRITE_BATCH_SIZE:
+            self.flush()
+        return cleaned
+
+    def flush(self):
+        '''Write the buffered misses and refresh the last use of the hits, in one transaction'''
+        if not self._written and not self._used:
+            return
+        now = time.time()
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany('INSERT OR IGNORE INTO cleaned (key, value, used) VALUES (?, ?, ?)',
+                                        [(key, cleaned, now) for key, cleaned in self._written.items()])
+            self.connection.executemany('UPDATE cleaned SET used = ? WHERE key = ?', [(now, key) for key in self._used])
+        self._written = {}
+        self._used = set()
+        self._refresh_before = now - REFRESH_SECONDS
+
+    def evict(self):
+        '''Drop the least recently used entries above max_entries'''
+        count = self.connection.execute('SELECT COUNT(*) FROM cleaned').fetchone()[0]
+        if count > self.max_entries:
+            self.connection.execute('DELETE FROM cleaned WHERE rowid IN (SELECT rowid FROM cleaned ORDER BY used, rowid LIMIT ?)',
+                                    (count - self.max_entries,))
+
+    def close(self):
+        # with several workers only the pool processes write, so this process may not have opened the file yet
+        if self._connection is None and not os.path.exists(self.path):
+            return
+        self.flush()
+        self.evict()
+        self._connection.close()
+        self._connection = None
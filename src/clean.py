@@ -1,9 +1,11 @@
-import emoji
+import functools
+import hashlib
+import heapq
+import json
+import os
 import re
 import string
 
-from bs4 import BeautifulSoup
-
 contraction_mapping = {"ain't": "is not", "aren't": "are not","can't": "cannot", "'cause": "because", "could've": "could have", "couldn't": "could not", 
                        "didn't": "did not",  "doesn't": "does not", "don't": "do not", "hadn't": "had not", "hasn't": "has not", "haven't": "have not", 
                        "he'd": "he would","he'll": "he will", "he's": "he is", "how'd": "how did", "how'd'y": "how do you", "how'll": "how will", 
@@ -46,58 +48,272 @@ mispell_dict = {'colour': 'color', 'centre': 'center', 'favourite': 'favorite',
                 'airhostess': 'air hostess', "whst": 'what', 'watsapp': 'whatsapp', 'demonitisation': 'demonetization', 'demonitization': 'demonetization',
                 'demonetisation': 'demonetization'}
 
-def clean_text(text):
+@functools.cache
+def import_emoji():
+    try:
+        import emoji
+    except ImportError as error:
+        raise ImportError('removing emoji needs the emoji package, pip install emoji') from error
+    return emoji
+
+@functools.cache
+def import_beautiful_soup():
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError as error:
+        raise ImportError('stripping complex html needs beautifulsoup4 and lxml, pip install beautifulsoup4 lxml') from error
+    return BeautifulSoup
+
+def _trie_pattern(words):
+    '''Build a regex matching the longest of `words` at a position, factored as a prefix trie.'''
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f'(?:{"|".join(branches)})'
+        if '' in node:
+            body = f'(?:{body})?' if len(branches) == 1 else f'{body}?'
+        return body
+
+    return build(trie)
+
+def _may_create(key, value, other):
+    '''Whether replacing `key` by `value` can produce an occurrence of `other` that was not there before.
+
+    Only the part of `value` that differs from `key` is new text, so a new occurrence
+    has to overlap it, or to span the junction it leaves when it is empty.'''
+    prefix = len(os.path.commonprefix([key, value]))
+    suffix = len(os.path.commonprefix([key[prefix:][::-1], value[prefix:][::-1]]))
+    changed_start, changed_end = prefix, len(value) - suffix
+    for start in range(1 - len(other), len(value) + 1):
+        end = start + len(other)
+        if changed_start < changed_end:
+            if end <= changed_start or start >= changed_end:
+                continue
+        elif start >= changed_start or end <= changed_start:
+            continue
+        overlap = range(max(0, start), min(len(value), end))
+        if all(value[position] == other[position - start] for position in overlap):
+            return True
+    return False
+
+class ReplacementTable:
+    '''Ordered find-and-replace table compiled once for fast application.
+
+    Applying the table gives exactly the same result as calling `str.replace` for
+    every (key, value) pair in order. Tables of single characters whose values never
+    bring in a later key collapse into one `str.translate` call. Other tables find
+    the keys present in one left-to-right scan of a trie regex and only replace
+    those, plus the later keys an applied value could have produced, in table order.'''
+
+    def __init__(self, mapping):
+        items = list(mapping.items()) if isinstance(mapping, dict) else list(mapping)
+        self.keys = [key for key, _ in items]
+        self.values = [value for _, value in items]
+        self._compiled = False
+
+    def _compile(self):
+        '''Build the translation or the trie regex, on the first call so importing the module stays cheap.'''
+        self._compiled = True
+        self._translation = None
+        if self._is_translatable():
+            self._translation = str.maketrans(dict(zip(self.keys, self.values)))
+            return
+        self._positions = {}
+        for index, key in enumerate(self.keys):
+            self._positions.setdefault(key, []).append(index)
+        self._pattern = re.compile(_trie_pattern(self._positions))
+        self._matches = {}
+        self._created = {}
+
+    def _match_info(self, key):
+        '''Keys found inside a match of `key`, and the offset to resume the scan at so that
+        a key starting inside the match and running past its end is not skipped.'''
+        if key not in self._matches:
+            contained = [index for other, indexes in self._positions.items() if other in key for index in indexes]
+            resume = next((offset for offset in range(1, len(key))
+                           if any(len(other) > len(key) - offset and other.startswith(key[offset:]) for other in self._positions)),
+                          len(key))
+            self._matches[key] = (contained, resume)
+        return self._matches[key]
+
+    def _created_by(self, index):
+        '''Later keys that replacing the key at `index` could bring into the text.'''
+        if index not in self._created:
+            key, value = self.keys[index], self.values[index]
+            self._created[index] = [later for later in range(index + 1, len(self.keys)) if _may_create(key, value, self.keys[later])]
+        return self._created[index]
+
+    def _is_translatable(self):
+        if len(set(self.keys)) != len(self.keys) or not all(len(key) == 1 for key in self.keys):
+            return False
+        return not any(later in value for index, value in enumerate(self.values) for later in self.keys[index + 1:])
+
+    def __call__(self, text):
+        if not self._compiled:
+            self._compile()
+        if self._translation is not None:
+            return text.translate(self._translation)
+        pending = set()
+        match = self._pattern.search(text)
+        while match:
+            contained, resume = self._match_info(match.group())
+            pending.update(contained)
+            match = self._pattern.search(text, match.start() + resume)
+        if not pending:
+            return text
+        pending = sorted(pending) # a sorted list is already a heap
+        done = -1
+        while pending:
+            index = heapq.heappop(pending)
+            if index == done:
+                continue
+            done = index
+            key = self.keys[index]
+            if key in text:
+                text = text.replace(key, self.values[index])
+                for later in self._created_by(index):
+                    heapq.heappush(pending, later)
+        return text
+
+@functools.lru_cache(maxsize=32)
+def _compile_items(items):
+    return ReplacementTable(items)
+
+def _as_table(mapping):
+    '''Return `mapping` compiled, reusing the compiled table for a mapping seen before.'''
+    if isinstance(mapping, ReplacementTable):
+        return mapping
+    return _compile_items(tuple(mapping.items()))
+
+apostrophe_table = ReplacementTable({s: "'" for s in ["’", "‘", "´", "`"]})
+contraction_table = ReplacementTable(contraction_mapping)
+punct_mapping_table = ReplacementTable(punct_mapping)
+punct_table = ReplacementTable({p: f' {p} ' for p in punct})
+special_table = ReplacementTable({'\u200b': ' ', '…': ' ... ', '\ufeff': '', 'करना': '', 'है': ''})
+mispell_table = ReplacementTable(mispell_dict)
+
+HTML_SPACE = ' \t\n\r\x0c'
+BR_TAG_RE = re.compile(r'<br\s*/?>')
+ENTITY_RE = re.compile(r'&(amp|lt|gt|quot|#39|#34);')
+ENTITIES = {'amp': '&', 'lt': '<', 'gt': '>', 'quot': '"', '#39': "'", '#34': '"'}
+
+def _strip_simple_html(text):
+    '''Text content of `text` if it only holds <br> tags and common entities, otherwise None.
+    The result follows lxml: leading whitespace is dropped and line breaks become "\\n".'''
+    if '\x00' in text or '\ufeff' in text:
+        return None
+    segments = BR_TAG_RE.split(text) if '<' in text else [text]
+    for index, segment in enumerate(segments):
+        if '<' in segment or ('&' in segment and '&' in ENTITY_RE.sub('', segment)):
+            return None
+        # lxml squeezes whitespace-only text between tags, leave that to the parser
+        if index and segment and not segment.strip(HTML_SPACE):
+            return None
+    segments[0] = segments[0].lstrip(HTML_SPACE)
+    text = ''.join(segments)
+    if '\r' in text:
+        text = ''.join(segment.replace('\r\n', '\n').replace('\r', '\n') for segment in segments)
+    if '&' in text:
+        text = ENTITY_RE.sub(lambda match: ENTITIES[match.group(1)], text)
+    return text
+
+def strip_html(text):
+    '''Remove html tags and entities, giving the same text as BeautifulSoup(text, 'lxml').get_text().
+    Most reviews have no markup at all, so the parser only runs on genuinely complex html.'''
+    stripped = _strip_simple_html(text)
+    if stripped is None:
+        stripped = import_beautiful_soup()(text, 'lxml').get_text()
+    return stripped
+
+EMOJI_MODE_STRIP = 'strip'
+EMOJI_MODE_DEMOJIZE = 'demojize'
+EMOJI_MODES = [EMOJI_MODE_STRIP, EMOJI_MODE_DEMOJIZE]
+
+NON_ASCII_RE = re.compile(r'[^\x00-\x7f]+')
+
+@functools.cache
+def _emoji_table():
+    '''str.translate table deleting every non ascii codepoint used by an emoji'''
+    return dict.fromkeys({ord(char) for key in import_emoji().EMOJI_DATA for char in key if ord(char) >= 0x80})
+
+def _strip_emoji_run(match):
+    return match.group().translate(_emoji_table())
+
+def remove_emoji(text, mode=EMOJI_MODE_STRIP):
+    '''
+    Remove emoji. strip deletes their codepoints directly: only the runs of non ascii characters are looked up,
+    and ascii text, which has none, is returned as is.
+    demojize is the former behaviour: emoji become their :name:, then everything between pairs of colons is dropped,
+    including ordinary text such as the middle of "note: it works: yes".
+    '''
+    if mode == EMOJI_MODE_DEMOJIZE:
+        text = import_emoji().demojize(text)
+        text = re.sub(r'\:(.*?)\:','',text)
+        return text
+    if text.isascii():
+        return text
+    return NON_ASCII_RE.sub(_strip_emoji_run, text)
+
+SQUARE_BRACKETS_RE = re.compile(r'\[.*?\]')
+URL_RE = re.compile(r'https?://\S+|www\.\S+')
+TAG_RE = re.compile(r'<.*?>+')
+# a word of \w characters holding a digit, like \w*\d\w* but only tried where a word starts, so it stays linear in the word length
+DIGIT_WORD_RE = re.compile(r'(?<!\w)[^\W\d]*\d\w*')
+# a run of two or more characters other than (a-z, A-Z, ".", "?", "!", ",", "'"), or a single one that is not a space,
+# the same runs as [^a-zA-Z?.!,¿']+ without replacing every single space by a space
+NON_ALPHA_RE = re.compile(r"[^a-zA-Z?.!,¿']{2,}|[^a-zA-Z?.!,¿' ]")
+# once string.punctuation is deleted, ¿ is the only character of [?.!,¿] left to space out and spaces the only ones of [" "]
+PUNCTUATION_TABLE = str.maketrans({**dict.fromkeys(string.punctuation), '¿': ' ¿ '})
+SPACES_RE = re.compile(' {2,}')
+
+def clean_text(text, emoji_mode=EMOJI_MODE_STRIP):
     '''Clean emoji, Make text lowercase, remove text in square brackets,remove links,remove punctuation
     and remove words containing numbers.'''
-    text = emoji.demojize(text)
-    text = re.sub(r'\:(.*?)\:','',text)
+    text = remove_emoji(text, emoji_mode)
     text = str(text).lower()    #Making Text Lowercase
-    text = re.sub('\[.*?\]', '', text)
+    if '[' in text:
+        text = SQUARE_BRACKETS_RE.sub('', text)
     #The next 2 lines remove html text
-    text = BeautifulSoup(text, 'lxml').get_text()
-    text = re.sub('https?://\S+|www\.\S+', '', text)
-    text = re.sub('<.*?>+', '', text)
-    text = re.sub('\n', '', text)
-    text = re.sub('\w*\d\w*', '', text)
+    text = strip_html(text)
+    if '://' in text or 'www.' in text:
+        text = URL_RE.sub('', text)
+    if '<' in text:
+        text = TAG_RE.sub('', text)
+    text = text.replace('\n', '')
+    text = DIGIT_WORD_RE.sub('', text)
     # replacing everything with space except (a-z, A-Z, ".", "?", "!", ",", "'")
-    text = re.sub(r"[^a-zA-Z?.!,¿']+", " ", text)
+    text = NON_ALPHA_RE.sub(' ', text)
     return text
 
 def clean_contractions(text, mapping):
     '''Clean contraction using contraction mapping'''    
-    specials = ["’", "‘", "´", "`"]
-    for s in specials:
-        text = text.replace(s, "'")
-    for word in mapping.keys():
-        if ""+word+"" in text:
-            text = text.replace(""+word+"", ""+mapping[word]+"")
-    #Remove Punctuations
-    text = re.sub('[%s]' % re.escape(string.punctuation), '', text)
-    # creating a space between a word and the punctuation following it
-    # eg: "he is a boy." => "he is a boy ."
-    text = re.sub(r"([?.!,¿])", r" \1 ", text)
-    text = re.sub(r'[" "]+', " ", text)
+    text = apostrophe_table(text)
+    text = _as_table(mapping)(text)
+    #Remove Punctuations, and create a space around ¿ in the same pass
+    text = text.translate(PUNCTUATION_TABLE)
+    text = SPACES_RE.sub(' ', text)
     return text
 
 def clean_special_chars(text, punct, mapping):
     '''Cleans special characters present(if any)'''   
-    for p in mapping:
-        text = text.replace(p, mapping[p])
-    
-    for p in punct:
-        text = text.replace(p, f' {p} ')
-    
-    specials = {'\u200b': ' ', '…': ' ... ', '\ufeff': '', 'करना': '', 'है': ''}  
-    for s in specials:
-        text = text.replace(s, specials[s])
-    
+    if not isinstance(punct, ReplacementTable):
+        punct = {p: f' {p} ' for p in punct}
+    text = _as_table(mapping)(text)
+    text = _as_table(punct)(text)
+    text = special_table(text)
     return text
 
 def correct_spelling(x, dic):
     '''Corrects common spelling errors'''   
-    for word in dic.keys():
-        x = x.replace(word, dic[word])
-    return x
+    return _as_table(dic)(x)
 
 def remove_space(text):
     '''Removes awkward spaces'''   
@@ -106,11 +322,20 @@ def remove_space(text):
     text = text.split()
     return " ".join(text)
 
-def text_preprocessing_pipeline(text):
+def text_preprocessing_pipeline(text, emoji_mode=EMOJI_MODE_STRIP):
     '''Cleaning and parsing the text.'''
-    text = clean_text(text)
-    text = clean_contractions(text, contraction_mapping)
-    text = clean_special_chars(text, punct, punct_mapping)
-    text = correct_spelling(text, mispell_dict)
+    text = clean_text(text, emoji_mode)
+    text = clean_contractions(text, contraction_table)
+    text = clean_special_chars(text, punct_table, punct_mapping_table)
+    text = correct_spelling(text, mispell_table)
     text = remove_space(text)
-    return text
\ No newline at end of file
+    return text
+
+def clean_fingerprint(emoji_mode=EMOJI_MODE_STRIP):
+    '''Digest of this module, its cleaning tables and the emoji mode, it changes whenever the cleaned output may change.'''
+    digest = hashlib.blake2b(emoji_mode.encode(), digest_size=16)
+    with open(__file__, 'rb') as f:
+        digest.update(f.read())
+    tables = [contraction_mapping, punct, punct_mapping, mispell_dict]
+    digest.update(json.dumps(tables, ensure_ascii=False).encode())
+    return digest.hexdigest()
\ No newline at end of file
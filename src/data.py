@@ -1,14 +1,155 @@
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, fields
+from typing import Iterable, Iterator
 
-@dataclass
+@dataclass(slots=True)
 class Data:
     index: str
     rating: int # 1-5 for train data, -1 for test data
     title: str
     text: str
     helpful_vote: int
-    verified_purchase: bool 
+    verified_purchase: bool
     processed_text: str
 
     def __str__(self):
-        return str(self.__dict__) 
\ No newline at end of file
+        return str({field.name: getattr(self, field.name) for field in fields(self)})
+
+class StringColumn:
+    '''
+    Strings stored back to back as utf-8 in a single buffer, with an offset array marking where each one ends.
+    It costs about one byte per ascii character plus 9 bytes per string, instead of a full str object per value.
+    '''
+    def __init__(self):
+        self.buffer = bytearray()
+        self.ends = array('q')
+        self.is_none = array('b')
+
+    @classmethod
+    def from_values(cls, values: Iterable[str | None]) -> 'StringColumn':
+        column = cls()
+        for value in values:
+            column.append(value)
+        return column
+
+    @classmethod
+    def of_none(cls, count: int) -> 'StringColumn':
+        '''Column of count None values'''
+        column = cls()
+        column.ends = array('q', [0]) * count
+        column.is_none = array('b', [1]) * count
+        return column
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def append(self, value: str | None):
+        if value is not None:
+            self.buffer += value.encode('utf-8', 'surrogatepass')
+        self.ends.append(len(self.buffer))
+        self.is_none.append(value is None)
+
+    def __getitem__(self, position: int) -> str | None:
+        if self.is_none[position]:
+            return None
+        start = self.ends[position - 1] if position > 0 else 0
+        return self.buffer[start:self.ends[position]].decode('utf-8', 'surrogatepass')
+
+    def __iter__(self) -> Iterator[str | None]:
+        return (self[position] for position in range(len(self)))
+
+    def take(self, positions: Iterable[int]) -> 'StringColumn':
+        '''New column holding the values at positions, copied as bytes without decoding them'''
+        column = StringColumn()
+        for position in positions:
+            start = self.ends[position - 1] if position > 0 else 0
+            column.buffer += self.buffer[start:self.ends[position]]
+            column.ends.append(len(column.buffer))
+            column.is_none.append(self.is_none[position])
+        return column
+
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.ends.itemsize * len(self.ends) + len(self.is_none)
+
+class DataBatch:
+    '''
+    Columnar store of many Data records: numbers in typed arrays and strings in StringColumn buffers.
+    Iterating a batch rebuilds Data records one at a time, so per record code keeps working on batches.
+    '''
+    STRING_FIELDS = ('index', 'title', 'text', 'processed_text')
+
+    def __init__(self, keep_raw_text: bool = True):
+        # processed records are only written, so a batch of them can store None for their raw title and text
+        self.keep_raw_text = keep_raw_text
+        self.index = StringColumn()
+        self.rating = array('i')
+        self.title = StringColumn()
+        self.text = StringColumn()
+        self.helpful_vote = array('i')
+        self.verified_purchase = array('b')
+        self.processed_text = StringColumn()
+
+    @classmethod
+    def from_data(cls, data: Iterable[Data], keep_raw_text: bool = True) -> 'DataBatch':
+        batch = cls(keep_raw_text)
+        batch.extend(data)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.rating)
+
+    def append(self, data: Data):
+        self.index.append(data.index)
+        self.rating.append(data.rating)
+        self.title.append(data.title if self.keep_raw_text else None)
+        self.text.append(data.text if self.keep_raw_text else None)
+        self.helpful_vote.append(data.helpful_vote)
+        self.verified_purchase.append(data.verified_purchase)
+        self.processed_text.append(data.processed_text)
+
+    def extend(self, data: Iterable[Data]):
+        for d in data:
+            self.append(d)
+
+    def __getitem__(self, position: int) -> Data:
+        return Data(
+            index=self.index[position],
+            rating=self.rating[position],
+            title=self.title[position],
+            text=self.text[position],
+            helpful_vote=self.helpful_vote[position],
+            verified_purchase=bool(self.verified_purchase[position]),
+            processed_text=self.processed_text[position]
+        )
+
+    def __iter__(self) -> Iterator[Data]:
+        return (self[position] for position in range(len(self)))
+
+    def take(self, positions: Iterable[int], keep_raw_text: bool | None = None) -> 'DataBatch':
+        '''New batch holding the records at positions, in that order, copied column by column'''
+        positions = list(positions)
+        batch = DataBatch(self.keep_raw_text if keep_raw_text is None else keep_raw_text)
+        for name in self.STRING_FIELDS:
+            if name in ('title', 'text') and not batch.keep_raw_text:
+                setattr(batch, name, StringColumn.of_none(len(positions)))
+            else:
+                setattr(batch, name, getattr(self, name).take(positions))
+        for name in ('rating', 'helpful_vote', 'verified_purchase'):
+            column = getattr(self, name)
+            setattr(batch, name, array(column.typecode, (column[position] for position in positions)))
+        return batch
+
+    def nbytes(self) -> int:
+        numbers = (self.rating, self.helpful_vote, self.verified_purchase)
+        return sum(getattr(self, name).nbytes() for name in self.STRING_FIELDS) + sum(column.itemsize * len(column) for column in numbers)
+
+def iter_batches(data: Iterable[Data], batch_size: int) -> Iterator[DataBatch]:
+    '''Group records into DataBatch objects of batch_size records, the last one may be shorter'''
+    batch = DataBatch()
+    for d in data:
+        batch.append(d)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = DataBatch()
+    if len(batch):
+        yield batch
@@ -0,0 +1,115 @@
+import hashlib
+import sqlite3
+import zlib
+
+from typing import Iterable, Iterator
+
+from .data import Data
+
+DEFAULT_NUM_PERM = 128
+SHINGLE_SIZE = 3
+SHINGLE_MULTIPLIER = 0x9E3779B97F4A7C15
+
+def import_numpy():
+    try:
+        import numpy
+    except ImportError as error:
+        raise ImportError('near duplicate detection needs numpy, it is installed with datasets or by pip install numpy') from error
+    return numpy
+
+def lsh_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+    '''Bands and rows per band whose LSH similarity threshold, about (1 / bands) ** (1 / rows), is closest to threshold'''
+    candidates = [(num_perm // rows, rows) for rows in range(1, num_perm + 1)]
+    return min(candidates, key=lambda candidate: abs((1 / candidate[0]) ** (1 / candidate[1]) - threshold))
+
+class MinHasher:
+    '''
+    MinHash signatures of the SHINGLE_SIZE word shingles of a text, with num_perm multiply-shift hash functions drawn from seed.
+    Words are hashed once and every shingle hash is combined from its word hashes in numpy, repeated shingles do not change a minimum.
+    '''
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 42):
+        self.np = import_numpy()
+        generator = self.np.random.RandomState(seed)
+        # odd multipliers, the upper 32 bits of the 64 bit products are the hashes
+        self.a = generator.randint(0, 1 << 63, size=num_perm, dtype=self.np.uint64) | self.np.uint64(1)
+        self.b = generator.randint(0, 1 << 63, size=num_perm, dtype=self.np.uint64)
+        self.multiplier = self.np.uint64(SHINGLE_MULTIPLIER)
+        self.shift = self.np.uint64(32)
+
+    def signature(self, text: str):
+        np = self.np
+        words = np.fromiter(map(zlib.crc32, text.lower().encode('utf-8', 'surrogatepass').split()), dtype=np.uint64)
+        num_shingles = max(1, len(words) - SHINGLE_SIZE + 1)
+        shingles = np.zeros(num_shingles, dtype=np.uint64)
+        for offset in range(SHINGLE_SIZE):
+            part = words[offset:offset + num_shingles]
+            shingles[:len(part)] = shingles[:len(part)] * self.multiplier + part
+        permuted = (shingles[:, None] * self.a + self.b) >> self.shift
+        return permuted.min(axis=0).astype(np.uint32)
+
+class Deduplicator:
+    '''
+    Finds duplicates in a stream of processed records, every record is compared with the records seen before it.
+    Exact duplicates have the same processed_text. With near_threshold, a record whose title and text share an
+    estimated Jaccard similarity of at least near_threshold of their word shingles with an earlier record is its
+    near duplicate, candidates are found by MinHash and LSH banding and confirmed on their signatures.
+    Every group of duplicates is known by the group key its first record was given.
+    The hashes live in a temporary SQLite database that spills to disk, so memory stays bounded for millions of records.
+    '''
+    def __init__(self, near_threshold: float | None = None, num_perm: int = DEFAULT_NUM_PERM, seed: int = 42):
+        self.near_threshold = near_threshold
+        self.unique = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        # an empty path is a private temporary database
+        self.connection = sqlite3.connect('')
+        self.connection.execute('CREATE TABLE exact (digest BLOB PRIMARY KEY, group_key BLOB NOT NULL) WITHOUT ROWID')
+        if near_threshold is not None:
+            self.hasher = MinHasher(num_perm, seed)
+            self.bands, self.rows = lsh_bands(near_threshold, num_perm)
+            # one indexed lookup per band in a single statement
+            self.bucket_query = ' UNION ALL '.join(['SELECT group_id FROM buckets WHERE band = ? AND bucket = ?'] * self.bands)
+            self.connection.execute('CREATE TABLE groups (id INTEGER PRIMARY KEY, group_key BLOB NOT NULL, signature BLOB NOT NULL)')
+            self.connection.execute('CREATE TABLE buckets (band INTEGER, bucket BLOB, group_id INTEGER NOT NULL, PRIMARY KEY (band, bucket)) WITHOUT ROWID')
+
+    def find(self, data: Data, group_key: bytes) -> bytes | None:
+        '''The group key of the earlier record data duplicates, or None when it is new and starts a group under group_key'''
+        digest = hashlib.blake2b(data.processed_text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        row = self.connection.execute('SELECT group_key FROM exact WHERE digest = ?', (digest,)).fetchone()
+        if row is not None:
+            self.exact_duplicates += 1
+            return row[0]
+        if self.near_threshold is None:
+            self.connection.execute('INSERT INTO exact VALUES (?, ?)', (digest, group_key))
+            self.unique += 1
+            return None
+
+        signature = self.hasher.signature(f'{data.title} {data.text}')
+        buckets = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        rows = self.connection.execute(self.bucket_query, [value for band_bucket in enumerate(buckets) for value in band_bucket]).fetchall()
+        for group_id in sorted({row[0] for row in rows}):
+            candidate_key, candidate_signature = self.connection.execute('SELECT group_key, signature FROM groups WHERE id = ?', (group_id,)).fetchone()
+            similarity = (self.hasher.np.frombuffer(candidate_signature, dtype=self.hasher.np.uint32) == signature).mean()
+            if similarity >= self.near_threshold:
+                # later exact copies of this record then skip the signature
+                self.connection.execute('INSERT INTO exact VALUES (?, ?)', (digest, candidate_key))
+                self.near_duplicates += 1
+                return candidate_key
+
+        self.connection.execute('INSERT INTO exact VALUES (?, ?)', (digest, group_key))
+        group_id = self.connection.execute('INSERT INTO groups (group_key, signature) VALUES (?, ?)', (group_key, signature.tobytes())).lastrowid
+        self.connection.executemany('INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)', ((band, bucket, group_id) for band, bucket in enumerate(buckets)))
+        self.unique += 1
+        return None
+
+    def drop_duplicates(self, data: Iterable[Data]) -> Iterator[Data]:
+        for d in data:
+            if self.find(d, b'') is None:
+                yield d
+
+    def summary(self) -> str:
+        near = f' and {self.near_duplicates} near duplicates' if self.near_threshold is not None else ''
+        return f'{self.unique} unique records, {self.exact_duplicates} exact duplicates{near}'
+
+    def close(self):
+        self.connection.close()
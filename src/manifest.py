@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+from typing import Iterable
+
+from .data import Data
+
+MANIFEST_NAME = 'manifest.sqlite'
+
+def record_key(data: Data, split: str) -> bytes:
+    '''Hash of the raw fields of a record, the split it was read for and nothing else, so moving it in the input keeps its key'''
+    fields = [split, data.rating, data.title, data.text, data.helpful_vote, data.verified_purchase]
+    return hashlib.blake2b(json.dumps(fields, ensure_ascii=False).encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+class Manifest:
+    '''
+    The processed rows of an output folder, kept in output_dir/manifest.sqlite so a later run only processes new or changed records.
+    Rows are keyed by record_key, and a record dropped by the processed method is kept with processed_text None.
+    The fingerprint names the processed method, its definition and the cleaning code the rows were made with, the manifest is emptied when it changes.
+    '''
+    def __init__(self, output_dir: str, fingerprint: str):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.fingerprint = fingerprint
+        os.makedirs(output_dir, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS rows (key BLOB PRIMARY KEY, processed_text TEXT, label INTEGER, '
+                                'helpful_vote INTEGER, verified_purchase INTEGER) WITHOUT ROWID')
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            row = self.connection.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+            if row is None or row[0] != fingerprint:
+                self.connection.execute('DELETE FROM rows')
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+
+    def __contains__(self, key: bytes) -> bool:
+        return self.connection.execute('SELECT 1 FROM rows WHERE key = ?', (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+
+    def get(self, key: bytes, index: str) -> Data | None:
+        '''The processed record stored for key, None when the processed method dropped it'''
+        row = self.connection.execute('SELECT processed_text, label, helpful_vote, verified_purchase FROM rows WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        processed_text, label, helpful_vote, verified_purchase = row
+        if processed_text is None:
+            return None
+        return Data(index=index, rating=label, title=None, text=None, helpful_vote=helpful_vote,
+                    verified_purchase=bool(verified_purchase), processed_text=processed_text)
+
+    def put(self, rows: Iterable[tuple[bytes, Data | None]]):
+        '''Store processed records by key, None marks a record the processed method dropped'''
+        with self.connection:
+            self.connection.execute('BEGIN')
+            self.connection.executemany('INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?)', (
+                (key, None, None, None, None) if data is None else
+                (key, data.processed_text, data.rating, data.helpful_vote, data.verified_purchase)
+                for key, data in rows))
+
+    def keep_only(self, keys: Iterable[bytes]) -> int:
+        '''Forget the rows of records that are no longer in the input, returns how many were forgotten'''
+        with self.connection:
+            self.connection.execute('BEGIN')
+            self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY) WITHOUT ROWID')
+            self.connection.execute('DELETE FROM seen')
+            self.connection.executemany('INSERT OR IGNORE INTO seen VALUES (?)', ((key,) for key in keys))
+            return self.connection.execute('DELETE FROM rows WHERE key NOT IN (SELECT key FROM seen)').rowcount
+
+    def close(self):
+        self.connection.close()
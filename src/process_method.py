@@ -1,6 +1,13 @@
-from abc import ABC, abstractmethod
-from .data import Data
+import hashlib
+import json
+import string
+
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+from .data import Data, DataBatch, StringColumn
 from .clean import text_preprocessing_pipeline
+from .utils import parallel_map
 
 ONLY_TTITLE_AND_TEXT_FLAG = 'only_title_and_text'
 CLEAN_ONLY_TTITLE_AND_TEXT_FLAG = 'clean_only_title_and_text'
@@ -9,240 +16,242 @@ CLEAN_MERGE_ALL_FEATURE_TO_TEXT_FLAG = 'clean_merge_all_feature_to_text'
 ONLY_12_STAR_ONLY_TITLE_AND_TEXT_FLAG = 'only_12_star_only_title_and_text'
 ONLY_45_STAR_ONLY_TITLE_AND_TEXT_FLAG = 'only_45_star_only_title_and_text'
 GROUP_12_AND_45_ONLY_TITLE_AND_TEXT_FLAG = 'group_12_and_45_only_title_and_text'
+ALL_FLAG = 'all'
 
-class ProcessMethod(ABC):
-    @abstractmethod
-    def process_train(self, data: Data) -> Data:
-        pass
+IGNORE_LABEL = -1
 
-    @abstractmethod
-    def process_test(self, data: Data) -> Data:
-        pass
+# the fields of a record a template can use
+TEMPLATE_FIELDS = ('index', 'title', 'text', 'helpful_vote', 'verified_purchase')
 
-    @abstractmethod
-    def process_train_dataset(self, data: list[Data]) -> list[Data]:
-        pass 
+class LabelTable:
+    '''
+    Maps a star rating (0 for test records) to a label, ratings left out of the mapping get IGNORE_LABEL.
+    Train records with IGNORE_LABEL are dropped, test records always keep their label.
+    '''
+    def __init__(self, mapping: dict[int, int]):
+        self.mapping = mapping
+        self.lookup = tuple(mapping.get(rating, IGNORE_LABEL) for rating in range(6))
 
-    @abstractmethod
-    def process_test_dataset(self, data: list[Data]) -> list[Data]:
-        pass
+    def __getitem__(self, rating: int) -> int:
+        return self.lookup[rating]
 
-class OnlyTitleAndText(ProcessMethod):
-    def process_train(self, data: Data) -> Data:
-        title_part = f'Review title is {data.title}' # try to fix the load_dataset will automatically filter some words
-        text_part = f'{data.text}'
-        data.processed_text = f'{title_part} [SEP] {text_part}'
-        data.rating = data.rating - 1
-        return data
+    def map_column(self, ratings: Iterable[int]) -> array:
+        '''Labels for a whole column of ratings'''
+        return array('i', map(self.lookup.__getitem__, ratings))
 
-    def process_test(self, data: Data) -> Data:
-        title_part = f'Review title is {data.title}' # try to fix the load_dataset will automatically filter some words
-        text_part = f'{data.text}'
-        data.processed_text = f'{title_part} [SEP] {text_part}'
-        data.rating = data.rating - 1
-        return data
-    
-    def process_train_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_train, data))
-    
-    def process_test_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_test, data))
-    
-class CleanOnlyTitleAndText(ProcessMethod):
-    def process_train(self, data: Data) -> Data:
-        title_text = text_preprocessing_pipeline(data.title)
-        text_text = text_preprocessing_pipeline(data.text)
-        data.processed_text = f'{title_text} [SEP] {text_text}'
-        data.rating = data.rating - 1
-        return data
+    def keep(self, data: Data) -> bool:
+        return self.lookup[data.rating] != IGNORE_LABEL
 
-    def process_test(self, data: Data) -> Data:
-        title_text = text_preprocessing_pipeline(data.title)
-        text_text = text_preprocessing_pipeline(data.text)
-        data.processed_text = f'{title_text} [SEP] {text_text}'
-        data.rating = data.rating - 1
-        return data
-    
-    def process_train_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_train, data))
-    
-    def process_test_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_test, data))
-    
-class Only12StarOnlyTitleAndText(ProcessMethod):
-    def get_transformed_rating(self, rating: int) -> int:
-        mapping = {
-            0: -1,  # test
-            1: 0,
-            2: 1,
-            3: -1,  # ignore
-            4: -1,  # ignore
-            5: -1   # ignore
-        }
-        return mapping[rating]
-    
-    def process_train(self, data: Data) -> Data:
-        title_part = f'Review title is {data.title}' # try to fix the load_dataset will automatically filter some words
-        text_part = f'{data.text}'
-        data.processed_text = f'{title_part} [SEP] {text_part}'
-        data.rating = self.get_transformed_rating(data.rating)
-        return data
+    @property
+    def names(self) -> list[str]:
+        '''Name of every label from the ratings it covers, such as 4_5_star'''
+        return ['_'.join(str(rating) for rating, mapped in sorted(self.mapping.items()) if mapped == label) + '_star'
+                for label in range(max(self.mapping.values()) + 1)]
 
-    def process_test(self, data: Data) -> Data:
-        title_part = f'Review title is {data.title}' # try to fix the load_dataset will automatically filter some words
-        text_part = f'{data.text}'
-        data.processed_text = f'{title_part} [SEP] {text_part}'
-        data.rating = self.get_transformed_rating(data.rating)
-        return data
-    
-    def process_train_dataset(self, data: list[Data]) -> list[Data]:
-        return list(filter(lambda x: x.rating != -1, map(self.process_train, data)))
-
-    def process_test_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_test, data))
-    
-class Only45StarOnlyTitleAndText(ProcessMethod):
-    def get_transformed_rating(self, rating: int) -> int:
-        mapping = {
-            0: -1,  # test
-            1: -1,  # ignore
-            2: -1,  # ignore
-            3: -1,  # ignore
-            4: 0,  
-            5: 1
-        }
-        return mapping[rating]
-    
-    def process_train(self, data: Data) -> Data:
-        title_part = f'Review title is {data.title}' # try to fix the load_dataset will automatically filter some words
-        text_part = f'{data.text}'
-        data.processed_text = f'{title_part} [SEP] {text_part}'
-        data.rating = self.get_transformed_rating(data.rating)
-        return data
+FIVE_STAR_LABEL_TABLE = LabelTable({1: 0, 2: 1, 3: 2, 4: 3, 5: 4})
+ONLY_12_STAR_LABEL_TABLE = LabelTable({1: 0, 2: 1})
+ONLY_45_STAR_LABEL_TABLE = LabelTable({4: 0, 5: 1})
+GROUP_12_AND_45_LABEL_TABLE = LabelTable({1: 0, 2: 0, 3: 1, 4: 2, 5: 2})
 
-    def process_test(self, data: Data) -> Data:
-        title_part = f'Review title is {data.title}' # try to fix the load_dataset will automatically filter some words
-        text_part = f'{data.text}'
-        data.processed_text = f'{title_part} [SEP] {text_part}'
-        data.rating = self.get_transformed_rating(data.rating)
-        return data
-    
-    def process_train_dataset(self, data: list[Data]) -> list[Data]:
-        return list(filter(lambda x: x.rating != -1, map(self.process_train, data)))
-
-    def process_test_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_test, data))
-
-class Group12and45OnlyTitleAndText(ProcessMethod):
-    def get_transformed_rating(self, rating: int) -> int:
-        mapping = {
-            0: -1,  # test
-            1: 0,
-            2: 0,
-            3: 1,
-            4: 2,  
-            5: 2
-        }
-        return mapping[rating]
-    
-    def process_train(self, data: Data) -> Data:
-        title_part = f'Review title is {data.title}' # try to fix the load_dataset will automatically filter some words
-        text_part = f'{data.text}'
-        data.processed_text = f'{title_part} [SEP] {text_part}'
-        data.rating = self.get_transformed_rating(data.rating)
-        return data
+@dataclass(frozen=True)
+class MethodSpec:
+    '''
+    A processed method: a str.format template over TEMPLATE_FIELDS, the fields cleaned before they are put in it,
+    the (false, true) texts of its bool fields, the label table of the ratings and whether the train records
+    the table ignores are dropped. choices is stored as (field, texts) pairs, a dict given for it is converted,
+    so a spec stays hashable.
+    '''
+    template: str
+    cleaned: tuple[str, ...] = ()
+    choices: tuple[tuple[str, tuple[str, str]], ...] = ()
+    label_table: LabelTable = FIVE_STAR_LABEL_TABLE
+    drop_ignored: bool = False
 
-    def process_test(self, data: Data) -> Data:
-        title_part = f'Review title is {data.title}' # try to fix the load_dataset will automatically filter some words
-        text_part = f'{data.text}'
-        data.processed_text = f'{title_part} [SEP] {text_part}'
-        data.rating = self.get_transformed_rating(data.rating)
-        return data
-    
-    def process_train_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_train, data))
+    def __post_init__(self):
+        object.__setattr__(self, 'cleaned', tuple(self.cleaned))
+        object.__setattr__(self, 'choices', tuple((name, tuple(texts)) for name, texts in dict(self.choices).items()))
 
-    def process_test_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_test, data))
+    def fingerprint(self) -> str:
+        '''Digest of the definition, it changes whenever the processed rows may change'''
+        definition = [self.template, list(self.cleaned), dict(self.choices), self.label_table.lookup, self.drop_ignored]
+        return hashlib.blake2b(json.dumps(definition, ensure_ascii=False).encode(), digest_size=16).hexdigest()
 
-class MergeAllFeatureToText(ProcessMethod):
-    def process_train(self, data: Data) -> Data:
-        title_part = f'This Review Title is {data.title}'
-        helpful_vote_part = f'{data.helpful_vote} people think this review is helpful'
-        verified_purchase_part = 'This reviewer did purchase it' if data.verified_purchase else 'This reviewer did not purchase it'
-        text_part = f'and the content is: {data.text}'
-        data.processed_text = f'{title_part} {text_part}.There are other information for this review, one is {verified_purchase_part} and the other is {helpful_vote_part}.'
-        data.rating = data.rating - 1
-        return data
+# the str.format conversions a template field may use, such as {title!r}
+CONVERSIONS = {None: None, 's': str, 'r': repr, 'a': ascii}
+
+class TextTemplate:
+    '''
+    The template of a MethodSpec parsed once into its literal parts and the fields between them.
+    format_record builds the text of one record, format_values the text of one record from the values of its fields,
+    which format_columns maps over whole columns.
+    '''
+    def __init__(self, spec: MethodSpec):
+        self.spec = spec
+        self.choices = dict(spec.choices)
+        self.literals = []
+        self.fields = []
+        self.format_specs = []
+        self.conversions = []
+        for literal, name, format_spec, conversion in string.Formatter().parse(spec.template):
+            if len(self.literals) > len(self.fields):
+                self.literals[-1] += literal # the parser splits literals at escaped braces
+            else:
+                self.literals.append(literal)
+            if name is None:
+                continue
+            if name not in TEMPLATE_FIELDS:
+                raise ValueError(f'Invalid field {name!r} in template {spec.template!r}, choose from {", ".join(TEMPLATE_FIELDS)}')
+            if '{' in format_spec:
+                raise ValueError(f'Nested field in the format spec of {name!r} in template {spec.template!r}')
+            self.fields.append(name)
+            self.format_specs.append(format_spec)
+            self.conversions.append(CONVERSIONS[conversion])
+        if not self.fields:
+            raise ValueError(f'Template {spec.template!r} uses no field')
+        if len(self.literals) == len(self.fields):
+            self.literals.append('')
+        for name in (*spec.cleaned, *self.choices):
+            if name not in self.fields:
+                raise ValueError(f'{name!r} is cleaned or chosen but not in template {spec.template!r}')
+
+    def format_values(self, values: Iterable) -> str:
+        '''Text of one record from the values of self.fields, already cleaned and chosen'''
+        parts = [self.literals[0]]
+        for value, format_spec, conversion, literal in zip(values, self.format_specs, self.conversions, self.literals[1:]):
+            parts.append(format(value if conversion is None else conversion(value), format_spec))
+            parts.append(literal)
+        return ''.join(parts)
+
+    def format_record(self, data: Data, clean) -> str:
+        values = []
+        for name in self.fields:
+            value = getattr(data, name)
+            if name in self.spec.cleaned:
+                value = clean(value)
+            elif name in self.choices:
+                value = self.choices[name][bool(value)]
+            values.append(value)
+        return self.format_values(values)
+
+    def format_columns(self, columns: Iterable[Iterable], clean_column) -> list[str]:
+        '''Texts of the records in columns, one per field in self.fields, clean_column cleans a whole column'''
+        columns = list(columns)
+        for position, name in enumerate(self.fields):
+            if name in self.spec.cleaned:
+                columns[position] = clean_column(columns[position])
+            elif name in self.choices:
+                choice = self.choices[name]
+                columns[position] = [choice[bool(value)] for value in columns[position]]
+        return list(map(self.format_values, zip(*columns)))
+
+PROCESS_METHODS: dict[str, MethodSpec] = {}
+
+def register_method(flag: str, spec: MethodSpec):
+    '''Add a processed method, a new variant only needs a flag and a MethodSpec'''
+    if flag in PROCESS_METHODS or flag == ALL_FLAG:
+        raise ValueError(f'Processed method flag already in use: {flag}')
+    TextTemplate(spec) # a bad template fails here rather than at its first record
+    PROCESS_METHODS[flag] = spec
+
+# "Review title is" tries to fix the load_dataset will automatically filter some words
+TITLE_AND_TEXT_TEMPLATE = 'Review title is {title} [SEP] {text}'
+TITLE_AND_TEXT = ('title', 'text')
+
+register_method(ONLY_TTITLE_AND_TEXT_FLAG, MethodSpec(TITLE_AND_TEXT_TEMPLATE))
+register_method(MERGE_ALL_FEATURE_TO_TEXT_FLAG, MethodSpec(
+    'This Review Title is {title} and the content is: {text}.There are other information for this review, '
+    'one is {verified_purchase} and the other is {helpful_vote} people think this review is helpful.',
+    choices={'verified_purchase': ('This reviewer did not purchase it', 'This reviewer did purchase it')}))
+register_method(CLEAN_ONLY_TTITLE_AND_TEXT_FLAG, MethodSpec('{title} [SEP] {text}', cleaned=TITLE_AND_TEXT))
+register_method(CLEAN_MERGE_ALL_FEATURE_TO_TEXT_FLAG, MethodSpec(
+    'this review title is: {title} and the content is: {text}.there are other information for this review, '
+    'one is {verified_purchase} and the other is {helpful_vote} people think this review is helpful.',
+    cleaned=TITLE_AND_TEXT, choices={'verified_purchase': ('this reviewer did not purchase it', 'this reviewer did purchase it')}))
+
+# a new grouping of the star ratings only needs a flag and a label table here
+STAR_GROUP_LABEL_TABLES = {
+    ONLY_12_STAR_ONLY_TITLE_AND_TEXT_FLAG: ONLY_12_STAR_LABEL_TABLE,
+    ONLY_45_STAR_ONLY_TITLE_AND_TEXT_FLAG: ONLY_45_STAR_LABEL_TABLE,
+    GROUP_12_AND_45_ONLY_TITLE_AND_TEXT_FLAG: GROUP_12_AND_45_LABEL_TABLE,
+}
+for flag, label_table in STAR_GROUP_LABEL_TABLES.items():
+    register_method(flag, MethodSpec(TITLE_AND_TEXT_TEMPLATE, label_table=label_table, drop_ignored=True))
+
+class ProcessMethod:
+    '''
+    Runs a MethodSpec. process_train and process_test build one record, the *_dataset methods stream records
+    through them, in a process pool with more than one worker. The *_batch methods format a whole DataBatch
+    column by column, unless process_train or process_test was replaced on the instance, as profiling does.
+    Without keep_raw_text, the batches they return hold None for the raw title and text, which are not written.
+    '''
+    def __init__(self, spec: MethodSpec, workers: int = 1, chunk_size: int | None = None, clean=text_preprocessing_pipeline):
+        self.spec = spec
+        self.template = TextTemplate(spec)
+        self.label_table = spec.label_table # the labels the method gives, for the dataset features
+        self.uses_clean = bool(spec.cleaned) # whether the title and text go through self.clean
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.clean = clean
+
+    def map(self, func, data: Iterable[Data]) -> Iterator[Data]:
+        '''Lazily apply func to every record, in a process pool when more than one worker is set'''
+        return parallel_map(func, data, self.workers, self.chunk_size)
+
+    def flush(self):
+        '''Write out what the clean step buffers, such as the misses of a CleanCache'''
+        flush = getattr(self.clean, 'flush', None)
+        if flush is not None:
+            flush()
 
-    def process_test(self, data: Data) -> Data:
-        title_part = f'This Review Title is {data.title}'
-        helpful_vote_part = f'{data.helpful_vote} people think this review is helpful'
-        verified_purchase_part = 'This reviewer did purchase it' if data.verified_purchase else 'This reviewer did not purchase it'
-        text_part = f'and the content is: {data.text}'
-        data.processed_text = f'{title_part} {text_part}.There are other information for this review, one is {verified_purchase_part} and the other is {helpful_vote_part}.'
-        data.rating = data.rating - 1
-        return data
-    
-    def process_train_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_train, data))
-    
-    def process_test_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_test, data))
-    
-class CleanMergeAllFeatureToText(ProcessMethod):
     def process_train(self, data: Data) -> Data:
-        title_text = text_preprocessing_pipeline(data.title)
-        text_text = text_preprocessing_pipeline(data.text)
-        title_part = f'this review title is: {title_text}'
-        helpful_vote_part = f'{data.helpful_vote} people think this review is helpful'
-        verified_purchase_part = 'this reviewer did purchase it' if data.verified_purchase else 'this reviewer did not purchase it'
-        text_part = f'and the content is: {text_text}'
-        data.processed_text = f'{title_part} {text_part}.there are other information for this review, one is {verified_purchase_part} and the other is {helpful_vote_part}.'
-        data.rating = data.rating - 1
+        data.processed_text = self.template.format_record(data, self.clean)
+        data.rating = self.label_table[data.rating]
         return data
 
     def process_test(self, data: Data) -> Data:
-        title_text = text_preprocessing_pipeline(data.title)
-        text_text = text_preprocessing_pipeline(data.text)
-        title_part = f'this review title is: {title_text}'
-        helpful_vote_part = f'{data.helpful_vote} people think this review is helpful'
-        verified_purchase_part = 'this reviewer did purchase it' if data.verified_purchase else 'this reviewer did not purchase it'
-        text_part = f'and the content is: {text_text}'
-        data.processed_text = f'{title_part} {text_part}.there are other information for this review, one is {verified_purchase_part} and the other is {helpful_vote_part}.'
-        data.rating = data.rating - 1
+        data.processed_text = self.template.format_record(data, self.clean)
+        data.rating = self.label_table[data.rating]
         return data
-    
-    def process_train_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_train, data))
-    
-    def process_test_dataset(self, data: list[Data]) -> list[Data]:
-        return list(map(self.process_test, data))
-  
-def get_processed_method(processed_method_flag: str) -> ProcessMethod:
-    if processed_method_flag == ONLY_TTITLE_AND_TEXT_FLAG:
-        return OnlyTitleAndText()
-    if processed_method_flag == MERGE_ALL_FEATURE_TO_TEXT_FLAG:
-        return MergeAllFeatureToText()
-    if processed_method_flag == CLEAN_ONLY_TTITLE_AND_TEXT_FLAG:
-        return CleanOnlyTitleAndText()
-    if processed_method_flag == CLEAN_MERGE_ALL_FEATURE_TO_TEXT_FLAG:
-        return CleanMergeAllFeatureToText()
-    if processed_method_flag == ONLY_12_STAR_ONLY_TITLE_AND_TEXT_FLAG:
-        return Only12StarOnlyTitleAndText()
-    if processed_method_flag == ONLY_45_STAR_ONLY_TITLE_AND_TEXT_FLAG:
-        return Only45StarOnlyTitleAndText()
-    if processed_method_flag == GROUP_12_AND_45_ONLY_TITLE_AND_TEXT_FLAG:
-        return Group12and45OnlyTitleAndText()
-    raise ValueError(f'Invalid processed method flag: {processed_method_flag}')
+
+    def process_train_dataset(self, data: Iterable[Data]) -> Iterator[Data]:
+        if self.spec.drop_ignored:
+            data = filter(self.label_table.keep, data)
+        return self.map(self.process_train, data)
+
+    def process_test_dataset(self, data: Iterable[Data]) -> Iterator[Data]:
+        return self.map(self.process_test, data)
+
+    def clean_column(self, texts: Iterable[str]) -> list[str]:
+        return list(self.map(self.clean, texts))
+
+    def process_batch(self, batch: DataBatch, drop_ignored: bool, keep_raw_text: bool) -> DataBatch:
+        labels = self.label_table.map_column(batch.rating)
+        positions = range(len(batch))
+        if drop_ignored and IGNORE_LABEL in labels:
+            positions = [position for position, label in enumerate(labels) if label != IGNORE_LABEL]
+            labels = array('i', (labels[position] for position in positions))
+        columns = ([column[position] for position in positions] for column in (getattr(batch, name) for name in self.template.fields))
+        processed = batch.take(positions, keep_raw_text)
+        processed.rating = labels
+        processed.processed_text = StringColumn.from_values(self.template.format_columns(columns, self.clean_column))
+        return processed
+
+    def process_train_batch(self, batch: DataBatch, keep_raw_text: bool = True) -> DataBatch:
+        '''Process a whole batch of train records'''
+        if 'process_train' in vars(self):
+            return DataBatch.from_data(self.process_train_dataset(batch), keep_raw_text)
+        return self.process_batch(batch, self.spec.drop_ignored, keep_raw_text)
+
+    def process_test_batch(self, batch: DataBatch, keep_raw_text: bool = True) -> DataBatch:
+        '''Process a whole batch of test records'''
+        if 'process_test' in vars(self):
+            return DataBatch.from_data(self.process_test_dataset(batch), keep_raw_text)
+        return self.process_batch(batch, drop_ignored=False, keep_raw_text=keep_raw_text)
+
+def get_processed_method(processed_method_flag: str, workers: int = 1, chunk_size: int | None = None, clean=text_preprocessing_pipeline) -> ProcessMethod:
+    if processed_method_flag not in PROCESS_METHODS:
+        raise ValueError(f'Invalid processed method flag: {processed_method_flag}')
+    return ProcessMethod(PROCESS_METHODS[processed_method_flag], workers, chunk_size, clean)
 
 def get_choise_flag() -> list[str]:
-    return [
-        ONLY_TTITLE_AND_TEXT_FLAG,
-        MERGE_ALL_FEATURE_TO_TEXT_FLAG,
-        CLEAN_ONLY_TTITLE_AND_TEXT_FLAG,
-        CLEAN_MERGE_ALL_FEATURE_TO_TEXT_FLAG,
-        ONLY_12_STAR_ONLY_TITLE_AND_TEXT_FLAG,
-        ONLY_45_STAR_ONLY_TITLE_AND_TEXT_FLAG,
-        GROUP_12_AND_45_ONLY_TITLE_AND_TEXT_FLAG
-    ]
\ No newline at end of file
+    return list(PROCESS_METHODS)
@@ -0,0 +1,154 @@
+import functools
+import heapq
+import json
+import time
+
+from contextlib import contextmanager, nullcontext
+from typing import Iterable, Iterator
+
+from . import clean as clean_module
+
+# the stages of src/clean.py, outer stages include the time of the stages they call
+CLEAN_STAGES = ['remove_emoji', 'strip_html', 'clean_text', 'clean_contractions', 'clean_special_chars', 'correct_spelling', 'remove_space']
+PHASES = ['read', 'process', 'shuffle/split', 'write']
+
+class StageStats:
+    __slots__ = ('calls', 'seconds', 'chars_in', 'chars_out')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.chars_in = 0
+        self.chars_out = 0
+
+    def to_dict(self) -> dict:
+        return {'calls': self.calls, 'seconds': self.seconds, 'chars_in': self.chars_in, 'chars_out': self.chars_out}
+
+class Profiler:
+    '''
+    Opt-in timing of the preprocessing run.
+    Phases are timed exclusively: while a phase pulls records from another timed iterator, that time is
+    charged to the inner phase, so streamed reading, processing and writing are still told apart.
+    Stages are the functions of src/clean.py, wrapped by install() to count calls, time and characters in and out.
+    A disabled profiler hands back its inputs untouched and installs nothing, so it costs nothing.
+    '''
+    def __init__(self, enabled: bool = False, slowest: int = 10):
+        self.enabled = enabled
+        self.slowest = slowest
+        self.phases = {phase: 0.0 for phase in PHASES}
+        self.stages: dict[str, StageStats] = {}
+        self.slowest_records = [] # min heap of (seconds, split, index)
+        self._stack = []
+        self._started = None
+        self._originals = {}
+        self.installed = False
+
+    def _switch(self):
+        now = time.perf_counter()
+        if self._stack:
+            self.phases[self._stack[-1]] += now - self._started
+        self._started = now
+
+    def enter(self, phase: str):
+        self._switch()
+        self._stack.append(phase)
+
+    def exit(self):
+        self._switch()
+        self._stack.pop()
+
+    def phase(self, phase: str):
+        '''Context manager charging the time spent inside it to phase'''
+        return self._phase(phase) if self.enabled else nullcontext()
+
+    @contextmanager
+    def _phase(self, phase: str):
+        self.enter(phase)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def iterate(self, phase: str, data: Iterable) -> Iterable:
+        '''Charge the time spent producing each item of data to phase'''
+        return self._iterate(phase, data) if self.enabled else data
+
+    def _iterate(self, phase: str, data: Iterable) -> Iterator:
+        iterator = iter(data)
+        while True:
+            self.enter(phase)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            yield item
+
+    def wrap_stage(self, name: str, func):
+        stats = self.stages.setdefault(name, StageStats())
+        @functools.wraps(func)
+        def timed(text, *args, **kwargs):
+            start = time.perf_counter()
+            result = func(text, *args, **kwargs)
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            stats.chars_in += len(text)
+            stats.chars_out += len(result)
+            return result
+        return timed
+
+    def wrap_record(self, func, split: str):
+        '''Time a per record function and keep the slowest records by their split and index'''
+        @functools.wraps(func)
+        def timed(data):
+            start = time.perf_counter()
+            result = func(data)
+            entry = (time.perf_counter() - start, split, data.index)
+            if len(self.slowest_records) < self.slowest:
+                heapq.heappush(self.slowest_records, entry)
+            elif entry > self.slowest_records[0]:
+                heapq.heapreplace(self.slowest_records, entry)
+            return result
+        return timed
+
+    def install(self):
+        '''Replace the stages in src/clean.py by timed wrappers, they are looked up by name so the pipeline picks them up'''
+        if not self.enabled:
+            return
+        for name in CLEAN_STAGES:
+            self._originals[name] = getattr(clean_module, name)
+            setattr(clean_module, name, self.wrap_stage(name, self._originals[name]))
+        self.installed = True
+
+    def uninstall(self):
+        for name, func in self._originals.items():
+            setattr(clean_module, name, func)
+        self._originals = {}
+        self.installed = False
+
+    def report(self) -> dict:
+        return {
+            'phases': self.phases,
+            'stages': {name: stats.to_dict() for name, stats in self.stages.items() if stats.calls},
+            'slowest_records': [{'split': split, 'index': index, 'seconds': seconds} for seconds, split, index in sorted(self.slowest_records, reverse=True)],
+        }
+
+    def show(self):
+        print(f'{"Phase":<32}{"Seconds":>10}')
+        for phase, seconds in self.phases.items():
+            print(f'{phase:<32}{seconds:>10.3f}')
+        stages = {name: stats for name, stats in self.stages.items() if stats.calls}
+        if stages:
+            print(f'\n{"Stage":<32}{"Calls":>10}{"Seconds":>10}{"us/call":>10}{"Chars in":>14}{"Chars out":>14}')
+            for name, stats in stages.items():
+                per_call = stats.seconds / stats.calls * 1e6
+                print(f'{name:<32}{stats.calls:>10}{stats.seconds:>10.3f}{per_call:>10.1f}{stats.chars_in:>14}{stats.chars_out:>14}')
+        if self.slowest_records:
+            print(f'\n{"Slowest records":<32}{"Seconds":>10}')
+            for seconds, split, index in sorted(self.slowest_records, reverse=True):
+                print(f'{f"{split} {index}":<32}{seconds:>10.6f}')
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
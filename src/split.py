@@ -0,0 +1,93 @@
+import hashlib
+import math
+import random
+
+from typing import Iterator
+
+from .data import Data
+
+def hash_fraction(key: bytes, seed: int) -> float:
+    '''Map key to a float in [0, 1) that only depends on the key and the seed'''
+    digest = hashlib.blake2b(key, digest_size=8, key=seed.to_bytes(8, 'little', signed=True))
+    return int.from_bytes(digest.digest(), 'little') / 2 ** 64
+
+def hash_split(key: bytes, seed: int, train_valid_ratio: float) -> str:
+    '''
+    Assign a record to 'train' or 'validation' from a seeded hash of its key.
+    Unlike shuffling, the assignment of a record never depends on the other records or on their order.
+    '''
+    return 'train' if hash_fraction(key, seed) < train_valid_ratio else 'validation'
+
+SHUFFLE_SPLIT_MODE = 'shuffle'
+HASH_SPLIT_MODE = 'hash'
+SPLIT_MODES = [SHUFFLE_SPLIT_MODE, HASH_SPLIT_MODE]
+CONTENT_SPLIT_KEY = 'content'
+INDEX_SPLIT_KEY = 'index'
+SPLIT_KEYS = [CONTENT_SPLIT_KEY, INDEX_SPLIT_KEY]
+
+class HashSplitter:
+    '''
+    Assigns processed records to 'train' or 'validation' one at a time, so they can stream straight to the split writers.
+    The key is the processed text, which also keeps identical rows together, or the index.
+    With stratify every label keeps the train_valid_ratio on its own, to within one record: the records of a label are
+    sampled systematically from a seeded random start. That needs one counter per label and, unlike the plain hash split,
+    depends on the input order.
+    '''
+    def __init__(self, seed: int, train_valid_ratio: float, split_key: str = CONTENT_SPLIT_KEY, stratify: bool = False):
+        self.seed = seed
+        self.train_valid_ratio = train_valid_ratio
+        self.split_key = split_key
+        self.stratify = stratify
+        self.seen = {}
+        self.starts = {}
+
+    def key(self, data: Data) -> bytes:
+        key = data.processed_text if self.split_key == CONTENT_SPLIT_KEY else data.index
+        return key.encode('utf-8', 'surrogatepass')
+
+    def __call__(self, data: Data, key: bytes | None = None) -> str:
+        '''The split of data, decided by key instead of the record's own key when it is given'''
+        if self.stratify:
+            label = data.rating
+            if label not in self.starts:
+                self.starts[label] = hash_fraction(str(label).encode(), self.seed)
+                self.seen[label] = 0
+            before = math.floor(self.seen[label] * self.train_valid_ratio + self.starts[label])
+            self.seen[label] += 1
+            after = math.floor(self.seen[label] * self.train_valid_ratio + self.starts[label])
+            return 'train' if after > before else 'validation'
+        return hash_split(self.key(data) if key is None else key, self.seed, self.train_valid_ratio)
+
+class ShuffleBuffer:
+    '''
+    Randomizes the order of a stream with a buffer of at most size items: once the buffer is full every
+    new item takes the place of a randomly picked one, which is handed out.
+    '''
+    def __init__(self, size: int, seed: int):
+        self.size = size
+        self.random = random.Random(seed)
+        self.buffer = []
+
+    def push(self, item):
+        '''Add item, returns the item handed out in exchange or None while the buffer fills up'''
+        if len(self.buffer) < self.size:
+            self.buffer.append(item)
+            return None
+        position = self.random.randrange(self.size)
+        out = self.buffer[position]
+        self.buffer[position] = item
+        return out
+
+    def drain(self) -> Iterator:
+        self.random.shuffle(self.buffer)
+        yield from self.buffer
+        self.buffer = []
+
+def buffered_shuffle(data, size: int, seed: int) -> Iterator:
+    '''Yield the items of data in an order randomized by a ShuffleBuffer of size items'''
+    buffer = ShuffleBuffer(size, seed)
+    for item in data:
+        out = buffer.push(item)
+        if out is not None:
+            yield out
+    yield from buffer.drain()
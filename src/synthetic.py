@@ -0,0 +1,49 @@
+import random
+
+from typing import Iterator
+
+WORDS = ['great', 'product', 'love', 'it', 'works', 'well', 'but', 'the', 'battery', 'died', 'after', 'a', 'week', 'would',
+         'not', 'buy', 'again', 'fits', 'perfectly', 'and', 'looks', 'nice', 'cheap', 'quality', 'colour', 'favourite',
+         'size', 'smaller', 'than', 'expected', 'arrived', 'on', 'time', 'my', 'daughter', 'uses', 'every', 'day', '2nd', 'x10']
+CONTRACTIONS = ["don't", "it's", "I'm", "can't", "won't", "they're", "I've", "wouldn't", "you'll", "that's", "isn't", "didn't"]
+EMOJIS = ['😀', '👍', '❤️', '🔥', '😡', '⭐', '👎', '🙂', '📦', '💯']
+HTML = ['<br />', '<br/><br/>', '&amp;', '&quot;', '<b>', '</b>', '<a href="#">', '</a>', '<div class="review">']
+URLS = ['https://www.amazon.com/dp/B0{:08d}', 'http://example.com/item/{}', 'www.shop{}.com']
+PUNCTUATION = ['.', ',', '!', '?', '...', ' -', ':', '™', '—', '’']
+
+def generate_text(rng: random.Random, num_words: int, emoji_rate: float, html_rate: float, url_rate: float, contraction_rate: float) -> str:
+    tokens = []
+    for _ in range(num_words):
+        draw = rng.random()
+        if draw < emoji_rate:
+            tokens.append(rng.choice(EMOJIS))
+        elif draw < emoji_rate + html_rate:
+            tokens.append(rng.choice(HTML))
+        elif draw < emoji_rate + html_rate + url_rate:
+            tokens.append(rng.choice(URLS).format(rng.randrange(10 ** 8)))
+        elif draw < emoji_rate + html_rate + url_rate + contraction_rate:
+            tokens.append(rng.choice(CONTRACTIONS))
+        else:
+            word = rng.choice(WORDS)
+            tokens.append(word + rng.choice(PUNCTUATION) if rng.random() < 0.1 else word)
+    text = ' '.join(tokens)
+    return text[:1].upper() + text[1:]
+
+def generate_reviews(num_records: int, seed: int = 42, mean_words: int = 60, emoji_rate: float = 0.02, html_rate: float = 0.02,
+                     url_rate: float = 0.005, contraction_rate: float = 0.03) -> Iterator[dict]:
+    '''
+    Deterministic synthetic reviews with the schema of the train json: rating, title, text, helpful_vote, verified_purchase.
+    Text lengths are spread around mean_words words, and every *_rate is the chance that a word is replaced by
+    an emoji, a html tag or entity, a url or a contraction.
+    '''
+    rng = random.Random(seed)
+    for _ in range(num_records):
+        title_words = rng.randint(1, 10)
+        text_words = max(1, int(rng.expovariate(1 / mean_words)))
+        yield {
+            'rating': float(rng.randint(1, 5)),
+            'title': generate_text(rng, title_words, emoji_rate, html_rate, url_rate, contraction_rate),
+            'text': generate_text(rng, text_words, emoji_rate, html_rate, url_rate, contraction_rate),
+            'helpful_vote': int(rng.expovariate(0.5)),
+            'verified_purchase': rng.random() < 0.8,
+        }
@@ -0,0 +1,74 @@
+import bisect
+
+from collections import Counter
+
+NUM_TOKENS_COLUMN = 'num_tokens'
+INPUT_IDS_COLUMN = 'input_ids'
+# tokenizers without a real limit report a huge model_max_length
+MAX_MODEL_LENGTH = 1_000_000
+
+def import_transformers():
+    try:
+        import transformers
+    except ImportError as error:
+        raise ImportError('--tokenizer_path needs transformers, pip install transformers') from error
+    return transformers
+
+def length_bucket(num_tokens: int, boundaries: list[int]) -> int:
+    '''Position of the bucket of num_tokens, bucket i holds the lengths up to boundaries[i] and the last one the longer ones'''
+    return bisect.bisect_left(boundaries, num_tokens)
+
+class TokenCounter:
+    '''
+    Tokenizes processed texts, a batch at a time, with a tokenizer loaded from a local path, and keeps the token
+    lengths of every split for the truncation report. max_length defaults to the tokenizer's model_max_length.
+    '''
+    def __init__(self, tokenizer_path: str, max_length: int | None = None, keep_input_ids: bool = False):
+        transformers = import_transformers()
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(tokenizer_path, local_files_only=True)
+        if max_length is None and self.tokenizer.model_max_length < MAX_MODEL_LENGTH:
+            max_length = self.tokenizer.model_max_length
+        self.max_length = max_length
+        self.keep_input_ids = keep_input_ids
+        self.lengths: dict[str, Counter] = {}
+
+    @property
+    def columns(self) -> list[str]:
+        return [NUM_TOKENS_COLUMN, INPUT_IDS_COLUMN] if self.keep_input_ids else [NUM_TOKENS_COLUMN]
+
+    def add_split(self, split: str):
+        '''Report split, in the order the splits were added, even if it stays empty'''
+        self.lengths.setdefault(split, Counter())
+
+    def __call__(self, texts: list[str], split: str) -> list[list[int]]:
+        '''input_ids of every text, untruncated, their lengths are counted for split'''
+        input_ids = self.tokenizer(texts)['input_ids'] if texts else []
+        self.lengths[split].update(map(len, input_ids))
+        return input_ids
+
+    def summary(self) -> str:
+        lines = []
+        for split, lengths in self.lengths.items():
+            total = sum(lengths.values())
+            if not total:
+                lines.append(f'{split}: 0 texts')
+                continue
+            ordered = sorted(lengths.items())
+            def percentile(p):
+                rank = min(int(total * p / 100), total - 1)
+                seen = 0
+                for length, count in ordered:
+                    seen += count
+                    if seen > rank:
+                        return length
+            mean = sum(length * count for length, count in ordered) / total
+            line = (f'{split}: {total} texts, mean {mean:.1f}, p50 {percentile(50)}, p95 {percentile(95)}, '
+                    f'p99 {percentile(99)}, max {ordered[-1][0]} tokens')
+            if self.max_length is not None:
+                truncated = sum(count for length, count in ordered if length > self.max_length)
+                line += f', {truncated} ({truncated / total:.1%}) longer than {self.max_length}'
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def reset(self):
+        self.lengths = {}
@@ -1,39 +1,110 @@
 import os
 import json 
+import itertools
+import math
 import random
+import shutil
 
-from .data import Data
+from collections import deque
+from typing import Iterable, Iterator
 
 def set_seed(seed: int):
     random.seed(seed)
 
-def read_train_json(json_path: str):
-    with open(json_path) as f:
-        data = json.load(f)
-    return data
+MIN_CHUNK_SIZE = 256
+CHUNKS_PER_WORKER = 4
+READ_BUFFER_SIZE = 1 << 20
+
+def iter_chunks(data: Iterable, chunk_size: int) -> Iterator[list]:
+    '''Group an iterable into lists of chunk_size items, the last one may be shorter'''
+    iterator = iter(data)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield chunk
+
+def _map_chunk(func, chunk: list) -> list:
+    results = list(map(func, chunk))
+    # func is unpickled for every chunk and dropped after it, so what it buffers, such as the misses of a CleanCache, is written now
+    flush = getattr(getattr(func, '__self__', func), 'flush', None)
+    if flush is not None:
+        flush()
+    return results
+
+def parallel_map(func, data: Iterable, workers: int = 1, chunk_size: int | None = None) -> Iterator:
+    '''
+    Lazily map func over data and yield the results in input order.
+    With more than one worker the data is sent to a process pool in chunks, by default about
+    CHUNKS_PER_WORKER chunks per worker and never smaller than MIN_CHUNK_SIZE records, so the
+    pickling cost of a chunk stays small next to the work done on it. At most
+    CHUNKS_PER_WORKER chunks per worker are in flight, so a streamed input stays bounded in memory.
+    '''
+    if workers <= 1:
+        yield from map(func, data)
+        return
+    if chunk_size is None:
+        chunk_size = MIN_CHUNK_SIZE
+        if hasattr(data, '__len__'):
+            chunk_size = max(MIN_CHUNK_SIZE, math.ceil(len(data) / (workers * CHUNKS_PER_WORKER)))
+    from multiprocessing import Pool # only a parallel run pays for importing multiprocessing
+    with Pool(workers) as pool:
+        pending = deque()
+        for chunk in iter_chunks(data, chunk_size):
+            pending.append(pool.apply_async(_map_chunk, (func, chunk)))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
 
-def read_test_json(json_path: str):
+def iter_json_records(json_path: str) -> Iterator[dict]:
+    '''
+    Yield the records of a JSON array file or a JSON Lines file one at a time.
+    The array is decoded incrementally from a READ_BUFFER_SIZE buffer, so the whole file is never held in memory.
+    '''
     with open(json_path) as f:
-        data = json.load(f)
-    return data
+        buffer = f.read(READ_BUFFER_SIZE)
+        while buffer and not buffer.strip():
+            buffer = f.read(READ_BUFFER_SIZE)
+        if not buffer.lstrip().startswith('['):
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        decoder = json.JSONDecoder()
+        position = len(buffer) - len(buffer.lstrip()) + 1
+        eof = False
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                record, end = None, len(buffer)
+            after = end
+            while after < len(buffer) and buffer[after] in ' \t\r\n':
+                after += 1
+            # a value cut at the end of the buffer may still decode, as 0 from 0.5, so it is only trusted once a , or ] follows
+            if after >= len(buffer) or buffer[after] not in ',]':
+                if eof:
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, after)
+                chunk = f.read(READ_BUFFER_SIZE)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield record
+            position = end
+
+def read_train_json(json_path: str) -> Iterator[dict]:
+    return iter_json_records(json_path)
+
+def read_test_json(json_path: str) -> Iterator[dict]:
+    return iter_json_records(json_path)
 
 def overwrite_folder(output_dir: str):
     if os.path.exists(output_dir):
-        os.system(f'rm -rf {output_dir}')
+        shutil.rmtree(output_dir)
     os.makedirs(output_dir)
-
-def write_csv(data: list[Data], output_dir: str, file_name: str):
-    output_dir = os.path.join(output_dir, 'data')
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    output_path = os.path.join(output_dir, file_name)
-
-    if os.path.exists(output_path):
-        os.system(f'rm -f {output_path}')
-
-    with open(output_path, 'w') as f:
-        f.write('index\ttext\tlabel\thelpful_vote\tverified_purchase')
-        for d in data:
-            f.write('\n')
-            f.write(f'{d.index}\t{d.processed_text}\t{d.rating}\t{d.helpful_vote}\t{d.verified_purchase}')
\ No newline at end of file
@@ -0,0 +1,264 @@
+import os
+import re
+
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+from .data import Data
+from .tokens import TokenCounter, length_bucket, NUM_TOKENS_COLUMN, INPUT_IDS_COLUMN
+
+TSV_FORMAT = 'tsv'
+PARQUET_FORMAT = 'parquet'
+ARROW_FORMAT = 'arrow'
+OUTPUT_FORMATS = [TSV_FORMAT, PARQUET_FORMAT, ARROW_FORMAT]
+
+COLUMNS = ['index', 'text', 'label', 'helpful_vote', 'verified_purchase']
+WRITE_BATCH_SIZE = 8192
+WRITE_BUFFER_SIZE = 1 << 20
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as error:
+        raise ImportError('parquet and arrow output need pyarrow, it is installed with datasets or by pip install pyarrow') from error
+    return pyarrow
+
+class ShardWriter(ABC):
+    '''Writes batches of records to one output file, followed by the token_columns of the input_ids of each batch'''
+    def __init__(self, path: str, token_columns: list[str] = []):
+        self.path = path
+        self.token_columns = token_columns
+
+    @abstractmethod
+    def write_batch(self, batch: list[Data], input_ids: list[list[int]] | None = None):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TsvShardWriter(ShardWriter):
+    '''Tab separated text, the only token column it can hold is num_tokens'''
+    def __init__(self, path: str, token_columns: list[str] = []):
+        super().__init__(path, token_columns)
+        if INPUT_IDS_COLUMN in token_columns:
+            raise ValueError('tsv output cannot hold input_ids, use parquet or arrow')
+        self.file = open(path, 'w', buffering=WRITE_BUFFER_SIZE)
+        self.file.write('\t'.join(COLUMNS + token_columns))
+
+    def write_batch(self, batch: list[Data], input_ids: list[list[int]] | None = None):
+        if not self.token_columns:
+            self.file.write(''.join([f'\n{d.index}\t{d.processed_text}\t{d.rating}\t{d.helpful_vote}\t{d.verified_purchase}' for d in batch]))
+            return
+        self.file.write(''.join([f'\n{d.index}\t{d.processed_text}\t{d.rating}\t{d.helpful_vote}\t{d.verified_purchase}\t{len(ids)}'
+                                 for d, ids in zip(batch, input_ids)]))
+
+    def close(self):
+        self.file.close()
+
+class PyArrowShardWriter(ShardWriter):
+    def __init__(self, path: str, token_columns: list[str] = []):
+        super().__init__(path, token_columns)
+        self.pa = import_pyarrow()
+        token_types = {NUM_TOKENS_COLUMN: self.pa.int32(), INPUT_IDS_COLUMN: self.pa.list_(self.pa.int32())}
+        self.schema = self.pa.schema([
+            ('index', self.pa.string()),
+            ('text', self.pa.string()),
+            ('label', self.pa.int64()),
+            ('helpful_vote', self.pa.int64()),
+            ('verified_purchase', self.pa.bool_()),
+        ] + [(column, token_types[column]) for column in token_columns])
+
+    def to_record_batch(self, batch: list[Data], input_ids: list[list[int]] | None = None):
+        columns = [
+            [d.index for d in batch],
+            [d.processed_text for d in batch],
+            [d.rating for d in batch],
+            [d.helpful_vote for d in batch],
+            [d.verified_purchase for d in batch],
+        ]
+        if NUM_TOKENS_COLUMN in self.token_columns:
+            columns.append([len(ids) for ids in input_ids])
+        if INPUT_IDS_COLUMN in self.token_columns:
+            columns.append(input_ids)
+        return self.pa.record_batch(columns, schema=self.schema)
+
+class ArrowShardWriter(PyArrowShardWriter):
+    '''Arrow IPC stream, the layout datasets memory-maps when it loads .arrow files'''
+    def __init__(self, path: str, token_columns: list[str] = []):
+        super().__init__(path, token_columns)
+        self.sink = self.pa.OSFile(path, 'wb')
+        self.writer = self.pa.ipc.new_stream(self.sink, self.schema)
+
+    def write_batch(self, batch: list[Data], input_ids: list[list[int]] | None = None):
+        self.writer.write_batch(self.to_record_batch(batch, input_ids))
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+class ParquetShardWriter(PyArrowShardWriter):
+    def __init__(self, path: str, token_columns: list[str] = []):
+        super().__init__(path, token_columns)
+        import pyarrow.parquet
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_batch(self, batch: list[Data], input_ids: list[list[int]] | None = None):
+        self.writer.write_batch(self.to_record_batch(batch, input_ids))
+
+    def close(self):
+        self.writer.close()
+
+SHARD_WRITERS = {
+    TSV_FORMAT: TsvShardWriter,
+    PARQUET_FORMAT: ParquetShardWriter,
+    ARROW_FORMAT: ArrowShardWriter,
+}
+
+def split_file_pattern(split: str) -> re.Pattern:
+    '''Names of the files SplitWriter writes for split, a single file or its shards in any output format'''
+    return re.compile(rf'{re.escape(split)}(-\d{{5}}-of-\d{{5}})?\.({"|".join(OUTPUT_FORMATS)})')
+
+def remove_stale_files(output_dir: str, split: str, keep: list[str]):
+    '''Remove files of split left by an earlier write, such as shards of another count or another format'''
+    pattern = split_file_pattern(split)
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if pattern.fullmatch(name) and path not in keep:
+            os.remove(path)
+
+def split_paths(output_dir: str, split: str) -> list[str]:
+    '''The files of split in output_dir/data in shard order, empty when the split was not written'''
+    data_dir = os.path.join(output_dir, 'data')
+    if not os.path.isdir(data_dir):
+        return []
+    pattern = split_file_pattern(split)
+    return [os.path.join(data_dir, name) for name in sorted(os.listdir(data_dir)) if pattern.fullmatch(name)]
+
+class SplitWriter:
+    '''
+    Writes the records of one split to output_dir/data as they are appended, serialized WRITE_BATCH_SIZE records at a time.
+    Without shard_size the split goes to a single {split}.{format} file, with it a new
+    {split}-00000-of-0000N.{format} shard is started every shard_size records, the naming datasets reads as one split.
+    Files are written under a .tmp name and only renamed once the split is complete.
+    With a tokenizer every batch is tokenized before it is written, adding the tokenizer's columns. With length_buckets
+    as well, the split gets one shard per bucket instead: shard i holds the records of up to length_buckets[i] tokens
+    and the last shard the longer ones, so a trainer reading a shard at a time pads its batches to similar lengths.
+    '''
+    def __init__(self, output_dir: str, split: str, output_format: str = TSV_FORMAT, shard_size: int | None = None,
+                 tokenizer: TokenCounter | None = None, length_buckets: list[int] | None = None):
+        if length_buckets and (tokenizer is None or shard_size):
+            raise ValueError('length buckets need a tokenizer and cannot be combined with shard_size')
+        self.output_dir = os.path.join(output_dir, 'data')
+        self.split = split
+        self.output_format = output_format
+        self.shard_size = shard_size
+        self.tokenizer = tokenizer
+        self.length_buckets = length_buckets
+        self.token_columns = []
+        if tokenizer is not None:
+            tokenizer.add_split(split)
+            self.token_columns = tokenizer.columns
+        self.paths = []
+        self.writer = None
+        self.bucket_writers = None
+        self.batch = []
+        self.shard_records = 0
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def _open_shard(self) -> ShardWriter:
+        path = os.path.join(self.output_dir, f'{self.split}-{len(self.paths):05d}.{self.output_format}.tmp')
+        self.paths.append(path)
+        return SHARD_WRITERS[self.output_format](path, self.token_columns)
+
+    def _tokenize(self) -> list[list[int]] | None:
+        if self.tokenizer is None:
+            return None
+        return self.tokenizer([d.processed_text for d in self.batch], self.split)
+
+    def _flush(self):
+        if self.length_buckets:
+            self._flush_buckets()
+            return
+        if self.writer is None:
+            self.writer = self._open_shard()
+        if self.batch:
+            self.writer.write_batch(self.batch, self._tokenize())
+            self.batch = []
+
+    def _flush_buckets(self):
+        if self.bucket_writers is None:
+            self.bucket_writers = [self._open_shard() for _ in range(len(self.length_buckets) + 1)]
+        buckets = [([], []) for _ in self.bucket_writers]
+        for d, ids in zip(self.batch, self._tokenize()):
+            records, input_ids = buckets[length_bucket(len(ids), self.length_buckets)]
+            records.append(d)
+            input_ids.append(ids)
+        for writer, (records, input_ids) in zip(self.bucket_writers, buckets):
+            if records:
+                writer.write_batch(records, input_ids)
+        self.batch = []
+
+    def _close_shards(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        for writer in self.bucket_writers or []:
+            writer.close()
+        self.bucket_writers = None
+
+    def append(self, data: Data):
+        self.batch.append(data)
+        self.shard_records += 1
+        if self.shard_records == self.shard_size:
+            self._flush()
+            self.writer.close()
+            self.writer = None
+            self.shard_records = 0
+        elif len(self.batch) >= WRITE_BATCH_SIZE:
+            self._flush()
+
+    def extend(self, data: Iterable[Data]):
+        for d in data:
+            self.append(d)
+
+    def close(self) -> list[str]:
+        '''Finish the last shard and rename the shards to their final names, returns the final paths'''
+        # an empty split still gets one file with just the header or schema
+        if self.batch or not self.paths:
+            self._flush()
+        self._close_shards()
+
+        final_paths = []
+        for shard_index, path in enumerate(self.paths):
+            if self.shard_size or self.length_buckets:
+                name = f'{self.split}-{shard_index:05d}-of-{len(self.paths):05d}.{self.output_format}'
+            else:
+                name = f'{self.split}.{self.output_format}'
+            final_path = os.path.join(self.output_dir, name)
+            os.replace(path, final_path)
+            final_paths.append(final_path)
+        remove_stale_files(self.output_dir, self.split, final_paths)
+        return final_paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.paths = self.close()
+        else:
+            self._close_shards()
+
+def write_split(data: Iterable[Data], output_dir: str, split: str, output_format: str = TSV_FORMAT, shard_size: int | None = None,
+                tokenizer: TokenCounter | None = None, length_buckets: list[int] | None = None) -> list[str]:
+    '''Write all records of one split with a SplitWriter, returns the written paths'''
+    with SplitWriter(output_dir, split, output_format, shard_size, tokenizer, length_buckets) as writer:
+        writer.extend(data)
+    return writer.paths
@@ -0,0 +1,75 @@
+'''
+Frozen copy of the cleaning functions of src/clean.py as they were before they were optimized, with the same tables.
+The tests compare the optimized functions against these, so a later edit cannot change the output unnoticed.
+'''
+import re
+import string
+import warnings
+
+from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
+
+from src.clean import contraction_mapping, punct, punct_mapping, mispell_dict, remove_emoji, import_emoji, EMOJI_MODE_DEMOJIZE
+
+def replace_in_order(text, items):
+    '''What a ReplacementTable of items must give, str.replace of every (key, value) pair in order'''
+    for key, value in items:
+        text = text.replace(key, value)
+    return text
+
+def clean_text(text, emoji_mode=EMOJI_MODE_DEMOJIZE):
+    '''The original re.sub chain, after the emoji step of emoji_mode, demojize being the original one'''
+    if emoji_mode == EMOJI_MODE_DEMOJIZE:
+        text = import_emoji().demojize(text)
+        text = re.sub(r'\:(.*?)\:','',text)
+    else:
+        text = remove_emoji(text, emoji_mode)
+    text = str(text).lower()
+    text = re.sub(r'\[.*?\]', '', text)
+    with warnings.catch_warnings():
+        # texts that look like a url or a file name are parsed all the same
+        warnings.simplefilter('ignore', MarkupResemblesLocatorWarning)
+        text = BeautifulSoup(text, 'lxml').get_text()
+    text = re.sub(r'https?://\S+|www\.\S+', '', text)
+    text = re.sub(r'<.*?>+', '', text)
+    text = re.sub('\n', '', text)
+    text = re.sub(r'\w*\d\w*', '', text)
+    text = re.sub(r"[^a-zA-Z?.!,¿']+", " ", text)
+    return text
+
+def clean_contractions(text, mapping=contraction_mapping):
+    specials = ["’", "‘", "´", "`"]
+    for s in specials:
+        text = text.replace(s, "'")
+    for word in mapping.keys():
+        if word in text:
+            text = text.replace(word, mapping[word])
+    text = re.sub('[%s]' % re.escape(string.punctuation), '', text)
+    text = re.sub(r"([?.!,¿])", r" \1 ", text)
+    text = re.sub(r'[" "]+', " ", text)
+    return text
+
+def clean_special_chars(text, punct=punct, mapping=punct_mapping):
+    for p in mapping:
+        text = text.replace(p, mapping[p])
+    for p in punct:
+        text = text.replace(p, f' {p} ')
+    specials = {'​': ' ', '…': ' ... ', '﻿': '', 'करना': '', 'है': ''}
+    for s in specials:
+        text = text.replace(s, specials[s])
+    return text
+
+def correct_spelling(x, dic=mispell_dict):
+    for word in dic.keys():
+        x = x.replace(word, dic[word])
+    return x
+
+def remove_space(text):
+    return " ".join(text.strip().split())
+
+def text_preprocessing_pipeline(text, emoji_mode=EMOJI_MODE_DEMOJIZE):
+    text = clean_text(text, emoji_mode)
+    text = clean_contractions(text)
+    text = clean_special_chars(text)
+    text = correct_spelling(text)
+    text = remove_space(text)
+    return text
@@ -0,0 +1,24 @@
+'''Deterministic texts for the equivalence tests, built from the pieces the cleaning functions treat specially'''
+import random
+
+from src.clean import contraction_mapping, punct, punct_mapping, mispell_dict
+
+PIECES = [
+    *contraction_mapping, *contraction_mapping.values(), *punct, *punct_mapping, *mispell_dict,
+    '<br />', '<br>', '<BR/>', '<b>bold</b>', '<p>para</p>', '<script>x</script>', '<!-- c -->', 'a < b > c',
+    '&amp;', '&lt;tag&gt;', '&quot;', '&#39;', '&#34;', '&nbsp;', '&unknown;', '&amp', '&',
+    'http://x.com/a?b', 'https://y.org', 'www.foo.org', '[note]', '[', ']', ':smile:', 'a:b:c', 'note: it works: yes',
+    '😀', '👍🏽', '❤️', '🇺🇸', '\n', '\r\n', '\r', '\t', '\x0c', '\x00', '\x07', '﻿', '​',
+    'abc123', '2k17', 'a_1', 'é1', '1ab', '٣', '²', 'é', 'ß', '中文', 'Ǆ', 'İ', 'करना', 'है', '…',
+    'Great product!', 'I LOVE IT', "It's", "DON'T", 'e.g', 'u.s', '#1', '5/5', '$20', 'well...', '?!', '¿', '  ', '  word  ',
+]
+
+def golden_texts(count, seed=0):
+    '''count texts of up to 25 random pieces, each followed by nothing, a space or a punctuation mark'''
+    rng = random.Random(seed)
+    return [''.join(rng.choice(PIECES) + rng.choice(['', ' ', ' ', '.', ',']) for _ in range(rng.randint(0, 25))) for _ in range(count)]
+
+def random_texts(alphabet, count, max_length, seed=0):
+    '''count texts of up to max_length random items of alphabet'''
+    rng = random.Random(seed)
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length))) for _ in range(count)]
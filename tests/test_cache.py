@@ -0,0 +1,57 @@
+import sqlite3
+
+from src.cache import CleanCache
+from src.utils import parallel_map
+
+def row_count(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute('SELECT COUNT(*) FROM cleaned').fetchone()[0]
+    finally:
+        connection.close()
+
+def test_cache_returns_cleaned_text(tmp_path):
+    cache = CleanCache(str(tmp_path / 'cache.sqlite'), clean=str.upper, fingerprint='test')
+    assert [cache(text) for text in ['a', 'b', 'a']] == ['A', 'B', 'A']
+    assert (cache.hits, cache.misses) == (1, 2)
+    cache.close()
+    cache = CleanCache(str(tmp_path / 'cache.sqlite'), clean=str.upper, fingerprint='test')
+    assert cache('b') == 'B' and (cache.hits, cache.misses) == (1, 0)
+    cache.close()
+
+def test_fingerprint_change_empties_the_cache(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = CleanCache(path, clean=str.upper, fingerprint='old')
+    cache('a')
+    cache.close()
+    cache = CleanCache(path, clean=str.lower, fingerprint='new')
+    assert cache('A') == 'a' and cache.misses == 1
+    cache.close()
+    assert row_count(path) == 1
+
+def test_close_evicts_the_least_recently_used(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = CleanCache(path, max_entries=2, clean=str.upper, fingerprint='test')
+    for text in ['a', 'b', 'c']:
+        cache(text)
+        cache.flush()
+    cache.close()
+    cache = CleanCache(path, max_entries=2, clean=str.upper, fingerprint='test')
+    assert [cache(text) for text in ['b', 'c']] == ['B', 'C'] and cache.misses == 0
+    cache.close()
+
+def test_close_evicts_after_a_parallel_run(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    texts = [f'text {i}' for i in range(3000)]
+    cache = CleanCache(path, max_entries=100, clean=str.upper, fingerprint='test')
+    assert list(parallel_map(cache, texts, workers=3)) == [text.upper() for text in texts]
+    # only the pool workers wrote, this process never opened the file
+    assert cache._connection is None
+    assert row_count(path) == len(texts)
+    cache.close()
+    assert row_count(path) == 100
+
+def test_close_without_a_file_creates_none(tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    CleanCache(str(path), clean=str.upper, fingerprint='test').close()
+    assert not path.exists()
@@ -0,0 +1,48 @@
+import re
+import string
+
+import pytest
+
+from src.clean import (clean_text, clean_contractions, contraction_table, DIGIT_WORD_RE, NON_ALPHA_RE, PUNCTUATION_TABLE, SPACES_RE,
+                       EMOJI_MODES)
+from src.synthetic import generate_reviews
+
+import baseline_clean
+from corpus import golden_texts, random_texts
+
+# clean_text gives url-like texts to BeautifulSoup too
+pytestmark = pytest.mark.filterwarnings('ignore::bs4.MarkupResemblesLocatorWarning')
+
+# characters and pieces where the fused regexes and the translate table could part from the original re.sub chain:
+# unicode letters and digits, _, the kept punctuation, runs of spaces and the markup the guarded passes look for
+ALPHABET = list("aZx_é٣²¿\"' \t\n\r.,!?;:-[]<>/()&#%@$*+=~`") + [
+    'http://', 'https://', 'www.', '://', '<br>', '<b>', '</b>', '>>', '[x]', '&amp;', '😀', "can't", '’', 'colour', '  ', '...',
+    'ab1', '1ab', 'a_1', 'é1', '​', '…', 'है', 'Ǆ', 'İ', '\x0c']
+
+def texts():
+    reviews = generate_reviews(500, seed=3, html_rate=0.1, url_rate=0.05)
+    return (random_texts(ALPHABET, 5000, 40, seed=5) + golden_texts(1000, seed=6)
+            + [review[field] for review in reviews for field in ('title', 'text')])
+
+@pytest.mark.parametrize('emoji_mode', EMOJI_MODES)
+def test_clean_text_matches_original(emoji_mode):
+    for text in texts():
+        assert clean_text(text, emoji_mode) == baseline_clean.clean_text(text, emoji_mode), repr(text)
+
+def test_clean_contractions_matches_original():
+    for text in texts():
+        assert clean_contractions(text, contraction_table) == baseline_clean.clean_contractions(text), repr(text)
+
+@pytest.mark.parametrize('emoji_mode', EMOJI_MODES)
+def test_clean_contractions_of_clean_text_matches_original(emoji_mode):
+    '''clean_contractions as the pipeline calls it, on text clean_text already reduced to letters and a few marks'''
+    for text in texts():
+        cleaned = baseline_clean.clean_text(text, emoji_mode)
+        assert clean_contractions(cleaned, contraction_table) == baseline_clean.clean_contractions(cleaned), repr(cleaned)
+
+def test_rewritten_patterns_match_original():
+    for text in random_texts(ALPHABET, 20000, 30, seed=7):
+        assert DIGIT_WORD_RE.sub('', text) == re.sub(r'\w*\d\w*', '', text), repr(text)
+        assert NON_ALPHA_RE.sub(' ', text) == re.sub(r"[^a-zA-Z?.!,¿']+", ' ', text), repr(text)
+        punctuated = re.sub(r'([?.!,¿])', r' \1 ', re.sub('[%s]' % re.escape(string.punctuation), '', text))
+        assert SPACES_RE.sub(' ', text.translate(PUNCTUATION_TABLE)) == re.sub(r'[" "]+', ' ', punctuated), repr(text)
@@ -0,0 +1,12 @@
+import os
+
+import pytest
+
+from check_import_time import BUDGETS_MS, check_module
+
+# multiplies every budget, set IMPORT_TIME_BUDGET_SCALE on slower machines such as shared CI runners
+BUDGET_SCALE = float(os.environ.get('IMPORT_TIME_BUDGET_SCALE', '1.0'))
+
+@pytest.mark.parametrize('module', list(BUDGETS_MS))
+def test_import_time_within_budget(module):
+    assert check_module(module, BUDGETS_MS[module] * BUDGET_SCALE, repeat=3) == []
@@ -0,0 +1,115 @@
+import json
+import random
+
+from argparse import Namespace
+
+from preprocess import process_incremental
+from src.clean import EMOJI_MODE_STRIP
+from src.manifest import Manifest
+from src.process_method import MethodSpec, CLEAN_ONLY_TTITLE_AND_TEXT_FLAG
+from src.profiler import Profiler
+from src.synthetic import generate_reviews
+from src.writer import split_paths, TSV_FORMAT
+
+FLAG = CLEAN_ONLY_TTITLE_AND_TEXT_FLAG
+
+class CountingClean:
+    '''Lower cases a text and remembers every text it was given, so a test sees which records were processed'''
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, text):
+        self.texts.append(text)
+        return text.lower()
+
+def make_reviews(count, seed):
+    reviews = list(generate_reviews(count, seed=seed, mean_words=8))
+    for number, review in enumerate(reviews):
+        review['text'] += f' review {seed} {number}' # every processed text is distinct, so it names its record in the output
+    return reviews
+
+def write_json(path, reviews):
+    path.write_text(json.dumps(reviews))
+    return str(path)
+
+def make_args(tmp_path, train, test):
+    return Namespace(train_json=write_json(tmp_path / 'train.json', train), test_json=write_json(tmp_path / 'test.json', test),
+                     train_valid_ratio=0.8, seed=42, workers=1, chunk_size=None, emoji_mode=EMOJI_MODE_STRIP, output_format=TSV_FORMAT,
+                     shard_size=None, length_buckets=None, shuffle_buffer_size=0)
+
+def run(args, output_dir):
+    clean = CountingClean()
+    process_incremental(FLAG, clean, args, str(output_dir), Profiler(False, 0), None)
+    return clean
+
+def split_of_text(output_dir):
+    '''The split every processed text was written to'''
+    splits = {}
+    for split in ('train', 'validation', 'test'):
+        for path in split_paths(str(output_dir), split):
+            with open(path) as f:
+                next(f)
+                for line in f:
+                    splits[line.split('\t')[1]] = split
+    return splits
+
+def processed_text(review):
+    return f'{review["title"].lower()} [SEP] {review["text"].lower()}'
+
+def test_incremental_update(tmp_path, monkeypatch):
+    output_dir = tmp_path / 'output'
+    train, test = make_reviews(300, seed=1), make_reviews(50, seed=2)
+    first = run(make_args(tmp_path, train, test), output_dir)
+    assert len(first.texts) == 2 * (len(train) + len(test))
+    before = split_of_text(output_dir)
+    assert {split for text, split in before.items()} == {'train', 'validation', 'test'}
+
+    rng = random.Random(0)
+    changed = rng.sample(range(len(train)), 10)
+    for position in changed:
+        train[position] = dict(train[position], text=train[position]['text'] + ' edited')
+    removed = [train.pop(position) for position in sorted(rng.sample(range(len(train)), 5), reverse=True)]
+    added = make_reviews(100, seed=3)
+    train += added
+    rng.shuffle(train) # moving records in the input keeps their split
+    test += make_reviews(20, seed=4)
+    second_args = make_args(tmp_path, train, test)
+    second = run(second_args, output_dir)
+
+    # only new and changed records went through the processed method, a title and a text each
+    new_texts = [text for review in added + [train_review for train_review in train if train_review['text'].endswith(' edited')]
+                 for text in (review['title'], review['text'])]
+    assert sorted(second.texts) == sorted(new_texts + [text for review in test[50:] for text in (review['title'], review['text'])])
+
+    after = split_of_text(output_dir)
+    assert len(after) == len(train) + len(test)
+    kept = [processed_text(review) for review in train if processed_text(review) in before]
+    assert len(kept) >= len(train) - len(added) - len(changed)
+    for text in kept:
+        assert after[text] == before[text]
+    for review in removed:
+        assert processed_text(review) not in after
+
+    # the updated folder holds what a fresh run on the same input writes
+    fresh_dir = tmp_path / 'fresh'
+    run(second_args, fresh_dir)
+    assert split_of_text(fresh_dir) == after
+
+    # a changed method definition empties the manifest, every record is processed again
+    fingerprint = MethodSpec.fingerprint
+    monkeypatch.setattr(MethodSpec, 'fingerprint', lambda spec: 'changed ' + fingerprint(spec))
+    third = run(second_args, output_dir)
+    assert len(third.texts) == 2 * (len(train) + len(test))
+    assert split_of_text(output_dir) == after
+
+def test_fingerprint_change_empties_the_manifest(tmp_path):
+    key = b'k' * 16
+    manifest = Manifest(str(tmp_path), 'method a')
+    manifest.put([(key, None)])
+    manifest.close()
+    manifest = Manifest(str(tmp_path), 'method a')
+    assert key in manifest and len(manifest) == 1
+    manifest.close()
+    manifest = Manifest(str(tmp_path), 'method b')
+    assert len(manifest) == 0
+    manifest.close()
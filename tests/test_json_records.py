@@ -0,0 +1,68 @@
+import json
+import random
+
+import pytest
+
+import src.utils
+from src.utils import iter_json_records
+
+BUFFER_SIZES = [1, 2, 3, 5, 7, 16, 64, 1 << 20]
+
+ARRAYS = [
+    [],
+    [123456789, 0.5, -100000.0, True, False, None],
+    [1e-7, 2.5e10, -0.0, 10, 'x', '', 0],
+    ['a]b', 'c,d', '],[', '\\', '"quoted"', 'é ü 漢字 😀', 'line\nbreak', ' '],
+    [{'rating': 5.0, 'title': 'Great, really]', 'text': 'works {fine}', 'helpful_vote': 0, 'verified_purchase': True}],
+    [{'nested': {'a': [1, [2, [3, {'b': ']'}]]], 'c': {}}, 'empty': []}, [[], [[]]], {'x': None}],
+]
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+def read_all(path, buffer_size, monkeypatch):
+    monkeypatch.setattr(src.utils, 'READ_BUFFER_SIZE', buffer_size)
+    return list(iter_json_records(path))
+
+@pytest.mark.parametrize('buffer_size', BUFFER_SIZES)
+@pytest.mark.parametrize('records', ARRAYS)
+def test_array_at_every_buffer_size(tmp_path, monkeypatch, records, buffer_size):
+    for index, text in enumerate([json.dumps(records), json.dumps(records, indent=4), json.dumps(records, ensure_ascii=False)]):
+        path = write(tmp_path / f'{index}.json', text)
+        assert read_all(path, buffer_size, monkeypatch) == records
+
+@pytest.mark.parametrize('buffer_size', BUFFER_SIZES)
+def test_array_with_surrounding_whitespace(tmp_path, monkeypatch, buffer_size):
+    records = [1, 'a', {'b': [2]}]
+    path = write(tmp_path / 'data.json', '\n \t\r\n  [ 1 ,\n"a"  ,\r\n  {"b" : [ 2 ] }\n ]\n\n')
+    assert read_all(path, buffer_size, monkeypatch) == records
+
+@pytest.mark.parametrize('buffer_size', [1, 3, 8, 1 << 20])
+def test_random_arrays(tmp_path, monkeypatch, buffer_size):
+    rng = random.Random(buffer_size)
+    scalars = [0, 7, -3, 0.5, 12.25, -1e5, 1e-3, True, False, None, '', ']', ',', '"', 'a b', '\\]']
+    def value(depth):
+        kind = rng.randrange(4 if depth < 3 else 1)
+        if kind == 0:
+            return rng.choice(scalars)
+        if kind == 1:
+            return [value(depth + 1) for _ in range(rng.randrange(4))]
+        return {f'k{i}': value(depth + 1) for i in range(rng.randrange(4))}
+    for index in range(20):
+        records = [value(0) for _ in range(rng.randrange(8))]
+        path = write(tmp_path / f'{index}.json', json.dumps(records, indent=rng.choice([None, 1])))
+        assert read_all(path, buffer_size, monkeypatch) == records
+
+@pytest.mark.parametrize('text', ['[1, 2', '[1, 2,', '[0.', '["a]', '[1 2]', '[{"a": 1}'])
+@pytest.mark.parametrize('buffer_size', [1, 4, 1 << 20])
+def test_malformed_array_raises(tmp_path, monkeypatch, text, buffer_size):
+    path = write(tmp_path / 'data.json', text)
+    with pytest.raises(json.JSONDecodeError):
+        read_all(path, buffer_size, monkeypatch)
+
+@pytest.mark.parametrize('buffer_size', [1, 5, 1 << 20])
+def test_json_lines(tmp_path, monkeypatch, buffer_size):
+    records = [{'rating': 1.0, 'text': 'a]b,c'}, {'rating': 4.5, 'text': 'line\nbreak'}, {'nested': [1, {'x': None}]}]
+    path = write(tmp_path / 'data.jsonl', '\n' + '\n'.join(json.dumps(record) for record in records) + '\n\n')
+    assert read_all(path, buffer_size, monkeypatch) == records
@@ -0,0 +1,92 @@
+import copy
+import functools
+import pickle
+
+import pytest
+
+from src.clean import text_preprocessing_pipeline, EMOJI_MODE_DEMOJIZE
+from src.data import Data, DataBatch
+from src.process_method import MethodSpec, TextTemplate, PROCESS_METHODS, get_choise_flag, get_processed_method
+from src.synthetic import generate_reviews
+
+import baseline_methods
+from corpus import golden_texts
+
+clean = functools.partial(text_preprocessing_pipeline, emoji_mode=EMOJI_MODE_DEMOJIZE)
+
+def make_records(rating_of):
+    reviews = list(generate_reviews(150, seed=5, mean_words=20, html_rate=0.05, url_rate=0.02))
+    texts = golden_texts(100, seed=5) + ['', '{title}', '{{}}', '%s %d', '\\', 'a}b{c']
+    records = []
+    for index, review in enumerate(reviews):
+        records.append(Data(f'index_{index}', rating_of(int(review['rating'])), review['title'], review['text'],
+                            review['helpful_vote'], review['verified_purchase'], None))
+    for index, text in enumerate(texts):
+        records.append(Data(f'golden_{index}', rating_of(index % 5 + 1), texts[-index - 1], text, index % 3, index % 2 == 0, None))
+    return records
+
+TRAIN = make_records(lambda rating: rating)
+TEST = make_records(lambda rating: 0) # test records are read with a rating of 0
+
+def rows(data):
+    return [(d.index, d.rating, d.processed_text) for d in data]
+
+@functools.cache
+def expected(flag, train):
+    method = baseline_methods.get_processed_method(flag)
+    if train:
+        return rows(method.process_train_dataset(copy.deepcopy(TRAIN)))
+    return rows(method.process_test_dataset(copy.deepcopy(TEST)))
+
+def test_same_flags_in_the_same_order():
+    assert get_choise_flag() == baseline_methods.get_choise_flag()
+
+@pytest.mark.parametrize('flag', get_choise_flag())
+def test_records_match_baseline(flag):
+    method = get_processed_method(flag, clean=clean)
+    assert rows(method.process_train_dataset(copy.deepcopy(TRAIN))) == expected(flag, True)
+    assert rows(method.process_test_dataset(copy.deepcopy(TEST))) == expected(flag, False)
+
+@pytest.mark.parametrize('flag', get_choise_flag())
+def test_single_records_match_baseline(flag):
+    method = get_processed_method(flag, clean=clean)
+    baseline = baseline_methods.get_processed_method(flag)
+    for data in TRAIN[:50]:
+        assert rows([method.process_train(copy.copy(data))]) == rows([baseline.process_train(copy.copy(data))])
+    for data in TEST[:50]:
+        assert rows([method.process_test(copy.copy(data))]) == rows([baseline.process_test(copy.copy(data))])
+
+@pytest.mark.parametrize('keep_raw_text', [True, False])
+@pytest.mark.parametrize('flag', get_choise_flag())
+def test_batches_match_baseline(flag, keep_raw_text):
+    method = get_processed_method(flag, clean=clean)
+    train = method.process_train_batch(DataBatch.from_data(copy.deepcopy(TRAIN)), keep_raw_text)
+    test = method.process_test_batch(DataBatch.from_data(copy.deepcopy(TEST)), keep_raw_text)
+    assert rows(train) == expected(flag, True)
+    assert rows(test) == expected(flag, False)
+    if not keep_raw_text:
+        assert all(d.title is None and d.text is None for d in train)
+
+@pytest.mark.parametrize('flag', get_choise_flag())
+def test_parallel_records_match_baseline(flag):
+    method = get_processed_method(flag, workers=2, chunk_size=64, clean=clean)
+    assert rows(method.process_train_dataset(copy.deepcopy(TRAIN))) == expected(flag, True)
+
+def test_spec_is_hashable():
+    for spec in PROCESS_METHODS.values():
+        assert hash(spec) == hash(MethodSpec(spec.template, spec.cleaned, dict(spec.choices), spec.label_table, spec.drop_ignored))
+        assert pickle.loads(pickle.dumps(spec)).fingerprint() == spec.fingerprint()
+
+@pytest.mark.parametrize('template', ['a {{b}} \\ "q\' {title!r:>30} {helpful_vote:05d} {text}\n{index}', '{title}', 'x{helpful_vote}%',
+                                      '{title}{text}{{x}}', '{verified_purchase!s:>8}{index!a}', '{{}}{title}{{'])
+def test_template_matches_str_format(template):
+    text_template = TextTemplate(MethodSpec(template))
+    for data in TRAIN[:20]:
+        expected_text = template.format(**{name: getattr(data, name) for name in ('index', 'title', 'text', 'helpful_vote', 'verified_purchase')})
+        assert text_template.format_record(data, None) == expected_text
+        assert text_template.format_columns([[getattr(data, name)] for name in text_template.fields], None) == [expected_text]
+
+@pytest.mark.parametrize('template', ['plain', '{bogus}', '{title:{text}}', '{title[0]}'])
+def test_bad_template_raises(template):
+    with pytest.raises(ValueError):
+        TextTemplate(MethodSpec(template))
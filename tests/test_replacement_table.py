@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from src.clean import (ReplacementTable, text_preprocessing_pipeline, apostrophe_table, contraction_table, punct_mapping_table,
+                       punct_table, special_table, mispell_table, contraction_mapping, punct, punct_mapping, mispell_dict, EMOJI_MODE_DEMOJIZE)
+from src.synthetic import generate_reviews
+
+import baseline_clean
+from corpus import golden_texts, random_texts
+
+def random_items(rng, alphabet, max_key_length):
+    '''A random ordered table over a small alphabet, so keys overlap, repeat and are created by earlier values'''
+    items = []
+    for _ in range(rng.randint(1, 8)):
+        key = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, max_key_length)))
+        value = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 3)))
+        items.append((key, value))
+    return items
+
+@pytest.mark.parametrize('max_key_length', [1, 3])
+@pytest.mark.parametrize('seed', range(100))
+def test_random_tables_match_replace_in_order(seed, max_key_length):
+    rng = random.Random(seed)
+    alphabet = 'ab c'[:rng.randint(2, 4)]
+    items = random_items(rng, alphabet, max_key_length)
+    table = ReplacementTable(items)
+    for text in random_texts(alphabet, 50, 30, seed):
+        assert table(text) == baseline_clean.replace_in_order(text, items), (items, text)
+
+@pytest.mark.parametrize('table, items', [
+    (apostrophe_table, [(s, "'") for s in ["’", "‘", "´", "`"]]),
+    (contraction_table, list(contraction_mapping.items())),
+    (punct_mapping_table, list(punct_mapping.items())),
+    (punct_table, [(p, f' {p} ') for p in punct]),
+    (special_table, [('​', ' '), ('…', ' ... '), ('﻿', ''), ('करना', ''), ('है', '')]),
+    (mispell_table, list(mispell_dict.items())),
+], ids=['apostrophe', 'contraction', 'punct_mapping', 'punct', 'special', 'mispell'])
+def test_module_tables_match_replace_in_order(table, items):
+    for text in golden_texts(2000, seed=1):
+        assert table(text) == baseline_clean.replace_in_order(text, items), text
+
+def test_pipeline_matches_baseline():
+    reviews = generate_reviews(500, seed=3, html_rate=0.1, url_rate=0.05)
+    texts = golden_texts(1500, seed=2) + [review[field] for review in reviews for field in ('title', 'text')]
+    for text in texts:
+        assert text_preprocessing_pipeline(text, EMOJI_MODE_DEMOJIZE) == baseline_clean.text_preprocessing_pipeline(text), text
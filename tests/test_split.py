@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from src.data import Data
+from src.split import hash_split, buffered_shuffle, HashSplitter, CONTENT_SPLIT_KEY, INDEX_SPLIT_KEY, SPLIT_KEYS
+
+def make_records(count, seed, labels=5):
+    rng = random.Random(seed)
+    texts = [f'review text {number}' for number in range(count // 2 + 1)]
+    # about half of the processed texts repeat an earlier one, as duplicates do
+    return [Data(f'index_{number}', rng.randrange(labels), None, None, 0, False, rng.choice(texts) if rng.random() < 0.5 else f'unique {number}')
+            for number in range(count)]
+
+def splits_of(records, splitter):
+    return {data.index: splitter(data) for data in records}
+
+@pytest.mark.parametrize('split_key', SPLIT_KEYS)
+def test_split_does_not_depend_on_input_order(split_key):
+    records = make_records(2000, seed=1)
+    expected = splits_of(records, HashSplitter(42, 0.8, split_key))
+    for seed in range(3):
+        shuffled = records[:]
+        random.Random(seed).shuffle(shuffled)
+        assert splits_of(shuffled, HashSplitter(42, 0.8, split_key)) == expected
+        # nor on the records around it
+        assert splits_of(shuffled[:500], HashSplitter(42, 0.8, split_key)) == {data.index: expected[data.index] for data in shuffled[:500]}
+
+def test_identical_text_lands_in_the_same_split():
+    records = make_records(3000, seed=2)
+    splitter = HashSplitter(42, 0.8, CONTENT_SPLIT_KEY)
+    split_of_text = {}
+    for data in records:
+        assert split_of_text.setdefault(data.processed_text, splitter(data)) == splitter(data)
+    assert set(split_of_text.values()) == {'train', 'validation'}
+
+def test_index_key_ignores_the_text():
+    splitter = HashSplitter(42, 0.5, INDEX_SPLIT_KEY)
+    records = [Data(f'index_{number}', 1, None, None, 0, False, 'same text') for number in range(200)]
+    assert {splitter(data) for data in records} == {'train', 'validation'}
+    assert splitter(Data('index_7', 1, None, None, 0, False, 'another text')) == splitter(records[7])
+
+@pytest.mark.parametrize('split_key', SPLIT_KEYS)
+def test_ratio_and_seed(split_key):
+    records = [Data(f'index_{number}', 1, None, None, 0, False, f'text {number}') for number in range(20000)]
+    splits = splits_of(records, HashSplitter(42, 0.8, split_key))
+    assert abs(list(splits.values()).count('train') / len(records) - 0.8) < 0.02
+    assert splits_of(records, HashSplitter(43, 0.8, split_key)) != splits
+    assert splits == {data.index: hash_split(HashSplitter(42, 0.8, split_key).key(data), 42, 0.8) for data in records}
+
+@pytest.mark.parametrize('ratio', [0.0, 0.1, 0.5, 0.8, 0.9, 0.95, 1.0])
+@pytest.mark.parametrize('seed', range(5))
+def test_stratified_ratio_per_label(ratio, seed):
+    rng = random.Random(seed)
+    for count in [1, 2, 7, 50, 333]:
+        records = make_records(count, seed=rng.randrange(1000), labels=rng.randint(1, 5))
+        splitter = HashSplitter(seed, ratio, stratify=True)
+        train = {}
+        total = {}
+        # every prefix of the stream already holds the ratio, so it holds whatever the input size
+        for data in records:
+            total[data.rating] = total.get(data.rating, 0) + 1
+            train[data.rating] = train.get(data.rating, 0) + (splitter(data) == 'train')
+            assert abs(train[data.rating] - total[data.rating] * ratio) < 1
+
+def test_buffered_shuffle_is_a_seeded_permutation():
+    items = list(range(1000))
+    shuffled = list(buffered_shuffle(items, 100, seed=3))
+    assert sorted(shuffled) == items and shuffled != items
+    assert list(buffered_shuffle(items, 100, seed=3)) == shuffled
+    assert list(buffered_shuffle(items[:50], 100, seed=3)) != items[:50]
@@ -0,0 +1,50 @@
+import warnings
+
+import pytest
+
+from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
+
+from src.clean import strip_html, _strip_simple_html
+
+from corpus import random_texts
+
+def parsed(text):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', MarkupResemblesLocatorWarning)
+        return BeautifulSoup(text, 'lxml').get_text()
+
+# texts the direct path handles, it must not leave them to the parser
+SIMPLE = [
+    '', 'plain text', 'great product, works fine',
+    'one<br>two', 'one<br/>two', 'one<br />two', 'one<br  />two', 'one<br\n/>two', '<br>starts with a break', 'ends with a break<br />',
+    'a<br><br>b', 'a<br /><br />b', 'a<br>b<br/>c<br />d',
+    'fish &amp; chips', '&lt;b&gt; is bold', '&quot;quoted&quot;', 'it&#39;s', '&#34;x&#34;', '&amp;amp;', '&amp;lt;',
+    '  leading spaces', '\n\nleading newlines', '\t\x0c leading mixed', 'trailing spaces  ', 'inner   spaces',
+    'windows\r\nline', 'old mac\rline', 'a\r\n\r\nb', '\r\nleading crlf', 'a\r<br>\rb', 'x<br />y\r\nz',
+    'a<br> b', 'a <br>b', 'a<br>  b', 'line\n<br />\nline',
+]
+
+# texts the direct path gives to the parser, with their output compared all the same
+COMPLEX = [
+    '<b>bold</b>', '<p>para</p><p>next</p>', '<script>x</script>', '<!-- comment -->', 'a < b > c', '<BR>upper', '<br/ >odd',
+    'a<br> <br>b', 'a<br>\n<br>b', 'a<br>\t<br>b', '<br> ', 'x<br>\r\n',
+    '&nbsp;', '&unknown;', '&amp', '&#39', 'AT&T', '& alone', '&&', '&amp;&', '&#x27;', '&#0;',
+    'nul\x00byte', 'bom﻿here', '﻿leading bom', 'a<br>\x00',
+    '<', '>', '<<>>', '<br', 'br>', '</br>', '<div>a<br>b</div>',
+]
+
+HTML_ALPHABET = ['a', 'b', ' ', '\n', '\r', '\r\n', '\t', '<br>', '<br/>', '<br />', '<b>', '</b>', '<', '>', '&amp;', '&lt;',
+                 '&quot;', '&#39;', '&amp', '&x;', '&', ';', '\x00', '﻿']
+
+@pytest.mark.parametrize('text', SIMPLE)
+def test_simple_html_is_stripped_directly(text):
+    assert _strip_simple_html(text) is not None
+    assert strip_html(text) == parsed(text)
+
+@pytest.mark.parametrize('text', COMPLEX)
+def test_complex_html_matches_parser(text):
+    assert strip_html(text) == parsed(text)
+
+def test_random_html_matches_parser():
+    for text in random_texts(HTML_ALPHABET, 3000, 12, seed=4):
+        assert strip_html(text) == parsed(text), repr(text)